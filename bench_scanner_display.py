@@ -0,0 +1,109 @@
+"""
+スキャナーモードの大画面表示の1スキャンあたりの更新時間の計測
+
+スキャン1回分（読み取り中 → チェックイン結果 → 待機中）の表示の切り替えを繰り返し、
+ScannerDisplay と、状態ごとに setStyleSheet でスタイルを当て直す方式とを比べる。
+
+    python bench_scanner_display.py [--scans 600]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from PySide6.QtWidgets import QApplication, QGroupBox, QVBoxLayout, QLabel
+from PySide6.QtCore import Qt
+
+from gui.scanner_display import ScannerDisplay
+
+BARCODE_STYLE = """
+    QLabel { background-color: %s; border: 3px solid #2196F3; border-radius: 10px; padding: 25px;
+             font-size: 48px; font-weight: bold; color: %s; min-height: 100px; max-height: 120px; }
+"""
+NAME_STYLE = """
+    QLabel { font-size: %dpx; font-weight: bold; color: #333; padding: 15px;
+             min-height: 90px; max-height: 110px; }
+"""
+STATUS_STYLE = """
+    QLabel { background-color: %s; font-size: 42px; font-weight: bold; color: %s; padding: 12px;
+             border-radius: 8px; min-height: 60px; max-height: 80px; }
+"""
+
+class InlineStyleDisplay(QGroupBox):
+    """比較用: 状態が変わるたびに各ラベルへ setStyleSheet で CSS を当て直す表示"""
+    
+    def __init__(self):
+        super().__init__("読み取り表示")
+        layout = QVBoxLayout(self)
+        self.barcode = QLabel()
+        self.name = QLabel()
+        self.status = QLabel()
+        for label in (self.barcode, self.name, self.status):
+            label.setAlignment(Qt.AlignCenter)
+            layout.addWidget(label)
+        self.reset()
+    
+    def reset(self):
+        self.barcode.setText(ScannerDisplay.IDLE_TEXT)
+        self.barcode.setStyleSheet(BARCODE_STYLE % ('#f5f5f5', '#2196F3'))
+        self.name.setText("")
+        self.name.setStyleSheet(NAME_STYLE % 64)
+        self.status.setText("")
+    
+    def show_scanned(self, barcode: str):
+        self.barcode.setText(f"ID: {barcode}")
+        self.barcode.setStyleSheet(BARCODE_STYLE % ('#E3F2FD', '#1976D2'))
+    
+    def show_check_in(self, barcode: str, name: str, is_first_visit: bool, visit_count: int):
+        self.name.setText(name)
+        self.name.setStyleSheet(NAME_STYLE % 72)
+        if is_first_visit:
+            self.status.setText("🎉 初回来場 - ようこそ！")
+            self.status.setStyleSheet(STATUS_STYLE % ('#C8E6C9', '#2E7D32'))
+        else:
+            self.status.setText(f"🔄 {visit_count}回目の来場 - お帰りなさい！")
+            self.status.setStyleSheet(STATUS_STYLE % ('#BBDEFB', '#1565C0'))
+
+def measure(app: QApplication, display, scans: int) -> list:
+    display.resize(1100, 420)
+    display.show()
+    app.processEvents()
+    
+    def scan(i: int):
+        barcode = f'{i:08d}'
+        display.show_scanned(barcode)
+        display.show_check_in(barcode, f'来場者{i}', i % 2 == 0, 3)
+        display.reset()
+    
+    # 最初の数回はフォントの読み込みなどを含むため除く
+    for i in range(30):
+        scan(i)
+    app.processEvents()
+    
+    times = []
+    for i in range(scans):
+        started = time.perf_counter()
+        scan(i)
+        times.append((time.perf_counter() - started) * 1000)
+    display.close()
+    return sorted(times)
+
+def main():
+    parser = argparse.ArgumentParser(description='大画面表示の更新時間の計測')
+    parser.add_argument('--scans', type=int, default=600)
+    args = parser.parse_args()
+    
+    app = QApplication(sys.argv)
+    print("=" * 60)
+    print(f"大画面表示の更新時間（1スキャン分, {args.scans} 回）")
+    print("=" * 60)
+    for label, display in (("ScannerDisplay", ScannerDisplay()),
+                           ("setStyleSheet で当て直す方式", InlineStyleDisplay())):
+        times = measure(app, display, args.scans)
+        print(f"{label}: 中央値 {times[len(times) // 2]:.3f} ms / "
+              f"95% {times[int(len(times) * 0.95)]:.3f} ms")
+
+if __name__ == '__main__':
+    main()
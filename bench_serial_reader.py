@@ -0,0 +1,80 @@
+"""
+シリアル読み取りスレッドの待機中CPU使用率と読み取り遅延の計測（macOS / Linux）
+
+疑似端末 (pty) をスキャナーの代わりにして ScannerReaderThread で読み取る。
+
+    python bench_serial_reader.py [--count 200] [--idle 5]
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+import tty
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from PySide6.QtCore import QCoreApplication, Qt
+
+from core.barcode_reader import ScannerReaderThread
+
+def main():
+    parser = argparse.ArgumentParser(description='シリアル読み取りスレッドの計測')
+    parser.add_argument('--count', type=int, default=200, help='送るバーコードの数')
+    parser.add_argument('--idle', type=float, default=5.0, help='待機中CPU使用率を測る秒数')
+    args = parser.parse_args()
+    
+    app = QCoreApplication(sys.argv)  # noqa: F841（QThread のシグナルに必要）
+    master, slave = os.openpty()
+    tty.setraw(master)
+    tty.setraw(slave)
+    
+    reader = ScannerReaderThread(port=os.ttyname(slave))
+    received = []
+    arrived = threading.Event()
+    
+    def on_barcode(barcode: str):
+        received.append((barcode, time.perf_counter()))
+        arrived.set()
+    
+    # 受け取った時刻を正確に残すため、読み取りスレッド上で直接呼ぶ
+    reader.barcode_detected.connect(on_barcode, Qt.DirectConnection)
+    reader.start()
+    time.sleep(0.5)
+    
+    print("=" * 60)
+    print("シリアル読み取りスレッドの計測")
+    print("=" * 60)
+    
+    # 待機中のCPU使用率（プロセス全体）
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+    time.sleep(args.idle)
+    cpu = (time.process_time() - cpu_start) / (time.perf_counter() - wall_start) * 100
+    print(f"待機中のCPU使用率: {cpu:.1f}%")
+    
+    # 1件ずつ送って、フレームが届くまでの時間（終端は CR / LF / CRLF を順に使う）
+    latencies = []
+    for i in range(args.count):
+        terminator = (b'\r', b'\n', b'\r\n')[i % 3]
+        arrived.clear()
+        sent = time.perf_counter()
+        os.write(master, f'CODE{i:05d}'.encode() + terminator)
+        if arrived.wait(0.5):
+            latencies.append((received[-1][1] - sent) * 1000)
+        time.sleep(0.02)
+    
+    latencies.sort()
+    in_order = [barcode for barcode, _ in received] == [f'CODE{i:05d}' for i in range(args.count)]
+    print(f"読み取り遅延: 中央値 {latencies[len(latencies) // 2]:.2f} ms / "
+          f"95% {latencies[int(len(latencies) * 0.95)]:.2f} ms / 最大 {latencies[-1]:.2f} ms")
+    print(f"受信: {len(received)} / {args.count} 件（順序・内容の一致: {'OK' if in_order else 'NG'}）")
+    
+    stop_start = time.perf_counter()
+    reader.stop()
+    print(f"停止までの時間: {(time.perf_counter() - stop_start) * 1000:.1f} ms")
+    os.close(master)
+    os.close(slave)
+
+if __name__ == '__main__':
+    main()
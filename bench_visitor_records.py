@@ -0,0 +1,80 @@
+"""
+VisitorDatabase の読み出しAPIの時間とメモリの計測
+
+本日分の来場履歴を持つ一時データベースを作り、辞書を返す従来のAPIと、Visitor / Visit の
+レコードを返すAPI・少しずつ返すイテレーターとを比べる（メモリは tracemalloc のピーク）。
+
+    python bench_visitor_records.py [--visits 200000] [--visitors 50000]
+"""
+import argparse
+import gc
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from core.database import VisitorDatabase
+
+def create_database(db_path: str, visits: int, visitors: int):
+    db = VisitorDatabase(db_path)
+    today = datetime.now().strftime('%Y-%m-%d')
+    db.import_visitors((f'B{i:07d}', f'来場者{i}', f'{today} 00:00:00', 1, f'{today} 00:00:00')
+                       for i in range(visitors))
+    
+    def visit_rows():
+        for i in range(visits):
+            seconds = i * 86400 // visits
+            visit_time = f'{seconds // 3600:02d}:{seconds // 60 % 60:02d}:{seconds % 60:02d}'
+            yield (None, f'B{i % visitors:07d}', f'来場者{i % visitors}', today, visit_time,
+                   int(i < visitors))
+    
+    db.import_visits(visit_rows())
+    db.close()
+
+def measure(label: str, func):
+    """func を2回実行し、1回目で tracemalloc のピーク、2回目で時間を測る"""
+    gc.collect()
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    
+    gc.collect()
+    started = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - started
+    print(f"{label:44s} {elapsed * 1000:8.0f} ms  ピーク {peak / 2 ** 20:7.1f} MiB")
+
+def main():
+    parser = argparse.ArgumentParser(description='読み出しAPIの時間とメモリの計測')
+    parser.add_argument('--visits', type=int, default=200000, help='本日の来場履歴の件数')
+    parser.add_argument('--visitors', type=int, default=50000, help='来場者マスタの件数')
+    args = parser.parse_args()
+    
+    with tempfile.TemporaryDirectory() as directory:
+        db_path = os.path.join(directory, 'visitors.db')
+        create_database(db_path, args.visits, args.visitors)
+        # キャッシュを使わず、毎回データベースから読む
+        db = VisitorDatabase(db_path, visitor_cache_size=0)
+        barcodes = [f'B{i:07d}' for i in range(args.visitors)]
+        
+        print("=" * 60)
+        print(f"読み出しAPIの計測（本日の来場 {args.visits:,} 件 / 来場者 {args.visitors:,} 人）")
+        print("=" * 60)
+        measure("get_today_visitors()（辞書のリスト）", lambda: db.get_today_visitors())
+        measure("list(iter_today_visits())（Visit のリスト）", lambda: list(db.iter_today_visits()))
+        measure("iter_today_visits() を順に数える",
+                lambda: sum(visit.is_first_visit for visit in db.iter_today_visits()))
+        measure("get_visitor_info() x 来場者数（辞書）",
+                lambda: [db.get_visitor_info(barcode) for barcode in barcodes])
+        measure("get_visitor() x 来場者数（Visitor）",
+                lambda: [db.get_visitor(barcode) for barcode in barcodes])
+        measure("list(iter_visitors())", lambda: list(db.iter_visitors()))
+        db.close()
+
+if __name__ == '__main__':
+    main()
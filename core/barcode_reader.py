@@ -1,11 +1,66 @@
+from typing import List
+
 import serial
 import serial.tools.list_ports
 from PySide6.QtCore import QThread, Signal
 
+class BarcodeFramer:
+    """
+    シリアルポートから届いたバイト列を CR / LF / CRLF 区切りのバーコードに切り分ける
+    
+    終端が届くまでは bytearray に溜めておき、完結したフレームだけを文字列に変換する。
+    CRLF の間で読み取りが分かれても空のフレームは捨てるため、1件として扱われる。
+    """
+    TERMINATORS = b'\r\n'
+    # 終端が来ないまま溜まり続けた場合に破棄する長さ
+    MAX_FRAME_LENGTH = 1024
+    
+    def __init__(self, encoding: str = 'utf-8'):
+        self.encoding = encoding
+        self._buffer = bytearray()
+        self.dropped_bytes = 0
+    
+    def feed(self, data: bytes) -> List[str]:
+        """受信データを追加し、完結したバーコードのリストを返す"""
+        self._buffer += data
+        frames = []
+        start = 0
+        for index, byte in enumerate(self._buffer):
+            if byte in self.TERMINATORS:
+                frame = self._decode(self._buffer[start:index])
+                if frame:
+                    frames.append(frame)
+                start = index + 1
+        del self._buffer[:start]
+        
+        if len(self._buffer) > self.MAX_FRAME_LENGTH:
+            self.dropped_bytes += len(self._buffer)
+            self._buffer.clear()
+        return frames
+    
+    def reset(self) -> int:
+        """未完結のデータを破棄し、破棄したバイト数を返す"""
+        pending = len(self._buffer)
+        self._buffer.clear()
+        return pending
+    
+    @property
+    def pending(self) -> int:
+        """終端待ちのバイト数"""
+        return len(self._buffer)
+    
+    def _decode(self, frame: bytes) -> str:
+        return frame.decode(self.encoding, errors='ignore').strip()
+
 class ScannerReaderThread(QThread):
     """バーコードスキャナー読み取りスレッド（USB/シリアルポート用）"""
     barcode_detected = Signal(str)
     error_occurred = Signal(str)
+    # ポートを開けたときに通知（ポート名）
+    connected = Signal(str)
+    
+    # データが届くまで read() で待つ最大秒数（stop() に応答するまでの最大時間）
+    READ_TIMEOUT = 0.1
     
     def __init__(self, port: str = None, baudrate: int = 9600):
         super().__init__()
@@ -13,16 +68,45 @@ class ScannerReaderThread(QThread):
         self.port = port
         self.baudrate = baudrate
         self.serial_conn = None
+        # 切断時に終端待ちだったバイト数（読み取り途中で失われたスキャン）
+        self.dropped_bytes = 0
+    
+    @staticmethod
+    def port_identity(port_info) -> str:
+        """
+        ポートに接続された機器を識別する文字列
+        
+        USB機器は VID/PID/シリアル番号（なければ接続位置）で識別するため、抜き差しで
+        COM番号が変わっても同じスキャナーと分かる。USB以外はポート名をそのまま使う。
+        """
+        if port_info.vid is None:
+            return port_info.device
+        identity = f"{port_info.vid:04X}:{port_info.pid:04X}"
+        if port_info.serial_number:
+            return f"{identity}:{port_info.serial_number}"
+        return f"{identity}@{port_info.location or port_info.device}"
+    
+    @staticmethod
+    def list_port_details():
+        """利用可能なシリアルポートの詳細（ポート名・説明・機器の識別子）"""
+        return [
+            {
+                'device': port.device,
+                'description': port.description,
+                'identity': ScannerReaderThread.port_identity(port),
+            }
+            for port in serial.tools.list_ports.comports()
+        ]
     
     @staticmethod
     def list_available_ports():
         """利用可能なシリアルポートをリストアップ"""
-        ports = serial.tools.list_ports.comports()
-        return [(port.device, port.description) for port in ports]
+        return [(port['device'], port['description']) for port in ScannerReaderThread.list_port_details()]
     
     def run(self):
         """シリアルポートからバーコードを読み取る"""
         self.running = True
+        framer = BarcodeFramer()
         
         try:
             if not self.port:
@@ -35,39 +119,38 @@ class ScannerReaderThread(QThread):
             self.serial_conn = serial.Serial(
                 port=self.port,
                 baudrate=self.baudrate,
-                timeout=1
+                timeout=self.READ_TIMEOUT
             )
-            
-            buffer = ""
+            self.connected.emit(self.port)
             
             while self.running:
-                if self.serial_conn.in_waiting > 0:
-                    try:
-                        data = self.serial_conn.read(self.serial_conn.in_waiting)
-                        decoded = data.decode('utf-8', errors='ignore')
-                        buffer += decoded
-                        
-                        if '\n' in buffer or '\r' in buffer:
-                            lines = buffer.split('\n')
-                            for line in lines[:-1]:
-                                line = line.strip().replace('\r', '')
-                                if line:
-                                    self.barcode_detected.emit(line)
-                            buffer = lines[-1]
-                    except Exception as e:
-                        self.error_occurred.emit(f"読み取りエラー: {str(e)}")
+                # 1バイト目が届くか READ_TIMEOUT が経過するまでブロックし、続きはまとめて読む
+                data = self.serial_conn.read(1)
+                if not data:
+                    continue
+                waiting = self.serial_conn.in_waiting
+                if waiting:
+                    data += self.serial_conn.read(waiting)
                 
+                for barcode in framer.feed(data):
+                    self.barcode_detected.emit(barcode)
+        
         except serial.SerialException as e:
-            self.error_occurred.emit(f"シリアルポート接続エラー: {str(e)}")
+            if self.running:
+                self.error_occurred.emit(f"シリアルポート接続エラー: {str(e)}")
         except Exception as e:
             self.error_occurred.emit(f"予期しないエラー: {str(e)}")
         finally:
+            self.dropped_bytes = framer.pending
             if self.serial_conn and self.serial_conn.is_open:
                 self.serial_conn.close()
     
     def stop(self):
-        """スレッドを停止"""
+        """スレッドを停止（読み取り待ちは最大 READ_TIMEOUT 秒で終わる）"""
         self.running = False
         if self.serial_conn and self.serial_conn.is_open:
-            self.serial_conn.close()
+            try:
+                self.serial_conn.cancel_read()
+            except (AttributeError, serial.SerialException):
+                pass
         self.wait()
@@ -0,0 +1,145 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Optional
+
+from core.database import VisitorDatabase
+
+class CheckInWriter:
+    """
+    チェックインをまとめてコミットするバックグラウンド書き込みスレッド
+    
+    submit() されたチェックインはキューに積まれ、batch_window 秒以内に続けて届いたものを
+    1つのトランザクションでまとめて書き込む。結果は submit() が返す Future で受け取る。
+    
+    on_stats_changed を指定すると、コミットのたびに最新の統計情報を渡して呼び出す（書き込みスレッド上）。
+    待機中は poll_interval 秒ごとに PRAGMA data_version を確認し、他の端末やプロセスが
+    同じデータベースに書き込んだ場合も呼び出す。自分の接続によるコミットでは data_version は
+    変化しないため、二重に通知されることはない。
+    """
+    
+    def __init__(self, db: VisitorDatabase, batch_window: float = 0.005,
+                 max_batch_size: int = 100, max_queue_size: int = 1000,
+                 submit_timeout: float = 1.0, on_stats_changed=None,
+                 poll_interval: float = 1.0):
+        self.db = db
+        self.on_stats_changed = on_stats_changed
+        self.poll_interval = poll_interval
+        self.batch_window = batch_window
+        self.max_batch_size = max_batch_size
+        self.submit_timeout = submit_timeout
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._thread = None
+        self._closed = False
+        self._lock = threading.Lock()
+        
+        # 計測用カウンター
+        self.check_in_count = 0
+        self.commit_count = 0
+    
+    def start(self):
+        """書き込みスレッドを開始"""
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="CheckInWriter", daemon=True)
+        self._thread.start()
+    
+    def submit(self, barcode: str, name: str) -> Future:
+        """チェックインを書き込みキューに追加し、結果を受け取る Future を返す"""
+        future = Future()
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("書き込みスレッドは停止しています")
+            try:
+                self._queue.put((barcode, name, future), timeout=self.submit_timeout)
+            except queue.Full:
+                raise RuntimeError("書き込みキューが満杯です") from None
+        return future
+    
+    def close(self, timeout: Optional[float] = None):
+        """受け付けを停止し、キューに残ったチェックインをすべて書き込んでから終了"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            if self._thread is not None:
+                self._queue.put(None)
+        if self._thread is not None:
+            self._thread.join(timeout)
+    
+    def _collect_batch(self, first):
+        """最初の1件に続けて batch_window 内に届いたチェックインを集める"""
+        batch = [first]
+        deadline = time.monotonic() + self.batch_window
+        
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                return batch, True
+            batch.append(item)
+        
+        return batch, False
+    
+    def _run(self):
+        stop = False
+        data_version = self._read_data_version()
+        try:
+            while not stop:
+                try:
+                    first = self._queue.get(timeout=self.poll_interval if self.on_stats_changed else None)
+                except queue.Empty:
+                    # 他の接続による書き込みがあった場合だけ統計を読み直す
+                    current = self._read_data_version()
+                    if current != data_version:
+                        data_version = current
+                        self._notify_stats_changed()
+                    continue
+                if first is None:
+                    break
+                batch, stop = self._collect_batch(first)
+                self._write_batch(batch)
+        finally:
+            self.db.release_connection()
+    
+    def _read_data_version(self) -> int:
+        return self.db.get_connection().execute('PRAGMA data_version').fetchone()[0]
+    
+    def _notify_stats_changed(self):
+        if not self.on_stats_changed:
+            return
+        try:
+            stats = self.db.get_statistics()
+        except Exception:
+            return
+        self.on_stats_changed(stats)
+    
+    def _write_batch(self, batch):
+        # キャンセル済みのチェックインは書き込まない
+        batch = [item for item in batch if item[2].set_running_or_notify_cancel()]
+        if not batch:
+            return
+        futures = [future for _, _, future in batch]
+        
+        try:
+            results = self.db.check_in_many([(barcode, name) for barcode, name, _ in batch])
+        except Exception as e:
+            for future in futures:
+                future.set_exception(e)
+            return
+        
+        self.commit_count += 1
+        self.check_in_count += len(batch)
+        for future, result in zip(futures, results):
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+        
+        self._notify_stats_changed()
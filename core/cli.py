@@ -0,0 +1,174 @@
+"""
+来場管理システムのコマンドラインツール（Qtを使用しない）
+
+使い方:
+    python -m core.cli export --table history --format csv --from 2024-04-01 --to 2024-04-30 -o april.csv
+    python -m core.cli export --table visitors --format jsonl
+    python -m core.cli import --table history --format csv -i april.csv
+    python -m core.cli register attendees.xlsx
+    python -m core.cli rebuild-stats
+"""
+import argparse
+import csv
+import json
+import sys
+from contextlib import contextmanager
+from typing import Iterator, Tuple
+
+from core.database import VisitorDatabase, VISITOR_COLUMNS, VISIT_COLUMNS
+
+TABLE_COLUMNS = {
+    'visitors': VISITOR_COLUMNS,
+    'history': VISIT_COLUMNS,
+}
+
+# 文字列で読み込んだ値を変換する列
+INTEGER_COLUMNS = {'id', 'visit_count'}
+BOOLEAN_COLUMNS = {'is_first_visit'}
+
+@contextmanager
+def open_output(path: str):
+    """出力先を開く（'-' は標準出力）"""
+    if path == '-':
+        yield sys.stdout
+    else:
+        with open(path, 'w', encoding='utf-8', newline='') as f:
+            yield f
+
+@contextmanager
+def open_input(path: str):
+    """入力元を開く（'-' は標準入力）"""
+    if path == '-':
+        yield sys.stdin
+    else:
+        with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+            yield f
+
+def write_rows(f, fmt: str, columns: Tuple[str, ...], rows: Iterator[Tuple]) -> int:
+    """行を CSV / JSON Lines で書き出し、書き出した行数を返す"""
+    count = 0
+    if fmt == 'csv':
+        writer = csv.writer(f)
+        writer.writerow(columns)
+        for row in rows:
+            writer.writerow(row)
+            count += 1
+    else:
+        for row in rows:
+            f.write(json.dumps(dict(zip(columns, row)), ensure_ascii=False))
+            f.write('\n')
+            count += 1
+    return count
+
+def convert_value(column: str, value):
+    if column in BOOLEAN_COLUMNS:
+        if isinstance(value, str):
+            return 1 if value.strip().lower() in ('1', 'true', 'yes', '初回') else 0
+        return 1 if value else 0
+    if column in INTEGER_COLUMNS and value not in (None, ''):
+        return int(value)
+    return value
+
+def read_rows(f, fmt: str, columns: Tuple[str, ...]) -> Iterator[Tuple]:
+    """CSV（ヘッダー付き）/ JSON Lines から列順のタプルを1行ずつ読み込む"""
+    if fmt == 'csv':
+        records = csv.DictReader(f)
+    else:
+        records = (json.loads(line) for line in f if line.strip())
+    for record in records:
+        yield tuple(convert_value(column, record.get(column)) for column in columns)
+
+def cmd_export(db: VisitorDatabase, args: argparse.Namespace) -> int:
+    """来場履歴 / 来場者マスタを CSV / JSON Lines で書き出す"""
+    if args.table == 'history':
+        rows = db.iter_visit_rows(args.date_from, args.date_to)
+    else:
+        rows = db.iter_visitor_rows()
+    
+    with open_output(args.output) as f:
+        count = write_rows(f, args.format, TABLE_COLUMNS[args.table], rows)
+    print(f"{count}行をエクスポートしました", file=sys.stderr)
+    return 0
+
+def cmd_import(db: VisitorDatabase, args: argparse.Namespace) -> int:
+    """CSV / JSON Lines から来場履歴 / 来場者マスタを取り込む"""
+    with open_input(args.input) as f:
+        rows = read_rows(f, args.format, TABLE_COLUMNS[args.table])
+        if args.table == 'history':
+            count = db.import_visits(rows)
+        else:
+            count = db.import_visitors(rows)
+    print(f"{count}行をインポートしました", file=sys.stderr)
+    return 0
+
+def cmd_register(db: VisitorDatabase, args: argparse.Namespace) -> int:
+    """事前登録者名簿（.xlsx / .csv）を来場者マスタへ登録する"""
+    def report(done: int, total: int):
+        suffix = f" / {total}" if total else ""
+        print(f"\r{done}{suffix} 行を処理...", end='', file=sys.stderr)
+    
+    result = db.import_registrations(
+        args.file,
+        update_existing=not args.keep_existing,
+        progress_callback=report,
+        encoding=args.encoding
+    )
+    print(f"\n{result['imported']}件を登録しました（読み飛ばし: {result['skipped']}行）", file=sys.stderr)
+    return 0
+
+def cmd_rebuild_stats(db: VisitorDatabase, args: argparse.Namespace) -> int:
+    """集計テーブルと来場者検索の索引を作り直す"""
+    db.rebuild_statistics()
+    stats = db.get_statistics()
+    print(f"集計を再構築しました: 総来場者数 {stats['total_visitors']}人 / "
+          f"総来場回数 {stats['total_visits']}回", file=sys.stderr)
+    return 0
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog='python -m core.cli', description='来場管理システム コマンドラインツール')
+    parser.add_argument('--db', default='visitors.db', help='データベースファイル (既定: visitors.db)')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    
+    export_parser = subparsers.add_parser('export', help='CSV / JSON Lines で書き出す')
+    export_parser.add_argument('--table', choices=sorted(TABLE_COLUMNS), default='history',
+                               help='対象テーブル (既定: history)')
+    export_parser.add_argument('--format', choices=['csv', 'jsonl'], default='csv', help='出力形式 (既定: csv)')
+    export_parser.add_argument('--from', dest='date_from', metavar='YYYY-MM-DD', help='来場日の開始（history のみ）')
+    export_parser.add_argument('--to', dest='date_to', metavar='YYYY-MM-DD', help='来場日の終了（history のみ）')
+    export_parser.add_argument('-o', '--output', default='-', help="出力ファイル (既定: '-' 標準出力)")
+    export_parser.set_defaults(func=cmd_export)
+    
+    import_parser = subparsers.add_parser('import', help='CSV / JSON Lines から取り込む')
+    import_parser.add_argument('--table', choices=sorted(TABLE_COLUMNS), default='history',
+                               help='対象テーブル (既定: history)')
+    import_parser.add_argument('--format', choices=['csv', 'jsonl'], default='csv', help='入力形式 (既定: csv)')
+    import_parser.add_argument('-i', '--input', default='-', help="入力ファイル (既定: '-' 標準入力)")
+    import_parser.set_defaults(func=cmd_import)
+    
+    register_parser = subparsers.add_parser('register', help='事前登録者名簿 (.xlsx / .csv) を一括登録')
+    register_parser.add_argument('file', help='名簿ファイル（見出し: バーコード, 氏名）')
+    register_parser.add_argument('--keep-existing', action='store_true',
+                                 help='登録済みのバーコードの氏名を上書きしない')
+    register_parser.add_argument('--encoding', default='utf-8-sig', help='CSV の文字コード (既定: utf-8-sig)')
+    register_parser.set_defaults(func=cmd_register)
+    
+    rebuild_parser = subparsers.add_parser('rebuild-stats', help='集計テーブルと来場者検索の索引を再構築')
+    rebuild_parser.set_defaults(func=cmd_rebuild_stats)
+    
+    return parser
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    # 単発のコマンドなので来場者キャッシュは読み込まない
+    db = VisitorDatabase(args.db, visitor_cache_size=0)
+    try:
+        return args.func(db, args)
+    except BrokenPipeError:
+        # head などで出力先が先に閉じられた場合
+        sys.stderr.close()
+        return 1
+    finally:
+        db.close()
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,16 +1,342 @@
+import random
 import sqlite3
-from datetime import datetime
-from typing import Optional, List, Dict, Tuple
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, datetime
+from itertools import chain, islice
+from typing import Optional, List, Dict, Tuple, Iterable, Iterator, NamedTuple, Union
 import os
 
+class Visitor(NamedTuple):
+    """来場者マスタの1行"""
+    barcode: str
+    name: str
+    first_visit_date: str
+    visit_count: int
+    last_visit_date: str
+
+class Visit(NamedTuple):
+    """来場履歴の1行（is_first_visit は 0 / 1）"""
+    id: int
+    barcode: str
+    name: str
+    visit_date: str
+    visit_time: str
+    is_first_visit: int
+
+# 一括入出力で扱う列（この順序のタプルでやり取りする）
+VISITOR_COLUMNS = Visitor._fields
+VISIT_COLUMNS = Visit._fields
+
+# 来場日時の範囲指定に使える値（datetime / date / UNIX 時刻）
+TimePoint = Union[datetime, date, int, float]
+
+class ArrivalBucket(NamedTuple):
+    """時間帯別の来場数（start は区間の開始の UNIX 時刻）"""
+    start: int
+    total_visits: int
+    first_visits: int
+    returning_visits: int
+
+class ExportCancelled(Exception):
+    """エクスポートが中断された"""
+    pass
+
+class _ExportProgress:
+    """エクスポートの進捗通知と中断確認"""
+    
+    def __init__(self, total: int, callback=None, is_cancelled=None):
+        self.total = total
+        self.done = 0
+        self.callback = callback
+        self.is_cancelled = is_cancelled
+    
+    def check_cancelled(self):
+        if self.is_cancelled and self.is_cancelled():
+            raise ExportCancelled()
+    
+    def advance(self, rows: int):
+        self.done += rows
+        if self.callback:
+            self.callback(self.done, max(self.total, self.done))
+        self.check_cancelled()
+
+# 集計テーブル (daily_stats / stats_totals) を来場履歴から作り直すSQL
+REBUILD_STATISTICS_SQL: Tuple[str, ...] = (
+    'DELETE FROM daily_stats',
+    '''
+    INSERT INTO daily_stats (visit_date, total_visits, first_visits, returning_visits)
+    SELECT visit_date, COUNT(*), SUM(is_first_visit), COUNT(*) - SUM(is_first_visit)
+    FROM visit_history
+    GROUP BY visit_date
+    ''',
+    '''
+    INSERT OR REPLACE INTO stats_totals (id, total_visitors, total_visits)
+    VALUES (1, (SELECT COUNT(*) FROM visitors WHERE visit_count > 0),
+            (SELECT COUNT(*) FROM visit_history))
+    ''',
+)
+
+# 分別集計テーブル minute_stats を来場履歴から作り直すSQL（minute は visited_at / 60）
+REBUILD_MINUTE_STATISTICS_SQL: Tuple[str, ...] = (
+    'DELETE FROM minute_stats',
+    '''
+    INSERT INTO minute_stats (minute, total_visits, first_visits, returning_visits)
+    SELECT visited_at / 60, COUNT(*), SUM(is_first_visit), COUNT(*) - SUM(is_first_visit)
+    FROM visit_history
+    WHERE visited_at IS NOT NULL
+    GROUP BY visited_at / 60
+    ''',
+)
+
+# 氏名検索用の全文検索索引 visitors_fts を visitors から作り直すSQL
+REBUILD_SEARCH_INDEX_SQL: Tuple[str, ...] = (
+    "INSERT INTO visitors_fts (visitors_fts) VALUES ('rebuild')",
+)
+
+# スキーマのマイグレーション定義
+# (バージョン, 説明, 実行するSQL) の順に並べ、PRAGMA user_version で適用済みバージョンを管理する。
+# 既存の定義は変更せず、必ず末尾に追加すること。
+MIGRATIONS: List[Tuple[int, str, Tuple[str, ...]]] = [
+    (1, "visit_history の日付・初回フラグ検索用インデックス", (
+        '''
+        CREATE INDEX IF NOT EXISTS idx_visit_history_date_first
+            ON visit_history (visit_date, is_first_visit)
+        ''',
+    )),
+    (2, "visit_history の日付・時刻順取得用インデックス", (
+        '''
+        CREATE INDEX IF NOT EXISTS idx_visit_history_date_time
+            ON visit_history (visit_date, visit_time)
+        ''',
+    )),
+    (3, "visit_history のバーコード検索用インデックス", (
+        '''
+        CREATE INDEX IF NOT EXISTS idx_visit_history_barcode
+            ON visit_history (barcode)
+        ''',
+    )),
+    (4, "日別集計テーブル daily_stats と全体集計テーブル stats_totals", (
+        '''
+        CREATE TABLE IF NOT EXISTS daily_stats (
+            visit_date TEXT PRIMARY KEY,
+            total_visits INTEGER NOT NULL DEFAULT 0,
+            first_visits INTEGER NOT NULL DEFAULT 0,
+            returning_visits INTEGER NOT NULL DEFAULT 0
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS stats_totals (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            total_visitors INTEGER NOT NULL DEFAULT 0,
+            total_visits INTEGER NOT NULL DEFAULT 0
+        )
+        ''',
+    ) + REBUILD_STATISTICS_SQL),
+    (5, "visitors に前回来場日時列を追加（チェックインを1文で行うため）", (
+        'ALTER TABLE visitors ADD COLUMN previous_visit_date TEXT',
+    )),
+    (6, "visit_history に来場日時の UNIX 時刻列 visited_at と範囲検索用インデックスを追加", (
+        'ALTER TABLE visit_history ADD COLUMN visited_at INTEGER',
+        # visit_date / visit_time はローカル時刻の文字列なので 'utc' で UNIX 時刻に直す
+        '''
+        UPDATE visit_history
+        SET visited_at = CAST(strftime('%s', visit_date || ' ' || visit_time, 'utc') AS INTEGER)
+        ''',
+        '''
+        CREATE INDEX IF NOT EXISTS idx_visit_history_visited_at
+            ON visit_history (visited_at)
+        ''',
+    )),
+    (7, "分別集計テーブル minute_stats（時間帯別の来場数・ピークの算出用）", (
+        '''
+        CREATE TABLE IF NOT EXISTS minute_stats (
+            minute INTEGER PRIMARY KEY,
+            total_visits INTEGER NOT NULL DEFAULT 0,
+            first_visits INTEGER NOT NULL DEFAULT 0,
+            returning_visits INTEGER NOT NULL DEFAULT 0
+        )
+        ''',
+    ) + REBUILD_MINUTE_STATISTICS_SQL),
+    (8, "氏名の部分一致検索用の全文検索索引 visitors_fts（FTS5 trigram）", (
+        # 氏名の文字列は visitors だけに持ち、索引は visitors の rowid で対応づける
+        '''
+        CREATE VIRTUAL TABLE IF NOT EXISTS visitors_fts USING fts5(
+            name, content='visitors', content_rowid='rowid', tokenize='trigram'
+        )
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS visitors_fts_insert AFTER INSERT ON visitors BEGIN
+            INSERT INTO visitors_fts (rowid, name) VALUES (new.rowid, new.name);
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS visitors_fts_delete AFTER DELETE ON visitors BEGIN
+            INSERT INTO visitors_fts (visitors_fts, rowid, name) VALUES ('delete', old.rowid, old.name);
+        END
+        ''',
+        # チェックインは name を更新しないので、このトリガーは動かない
+        '''
+        CREATE TRIGGER IF NOT EXISTS visitors_fts_update AFTER UPDATE OF name ON visitors
+        WHEN old.name IS NOT new.name BEGIN
+            INSERT INTO visitors_fts (visitors_fts, rowid, name) VALUES ('delete', old.rowid, old.name);
+            INSERT INTO visitors_fts (rowid, name) VALUES (new.rowid, new.name);
+        END
+        ''',
+    ) + REBUILD_SEARCH_INDEX_SQL),
+]
+
+class VisitorCache:
+    """
+    来場者のメモリキャッシュ（バーコード -> (氏名, 来場回数, 最終来場日時)）
+    
+    max_entries を超えると最も長く参照されていない来場者から破棄する（LRU）。
+    GUIスレッドと書き込みスレッドの両方から使われるためロックで保護する。
+    """
+    
+    def __init__(self, max_entries: Optional[int] = None):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    def get(self, barcode: str) -> Optional[Tuple[str, int, str]]:
+        """キャッシュから来場者を取得（なければ None）"""
+        with self._lock:
+            entry = self._entries.get(barcode)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(barcode)
+            self.hits += 1
+            return entry
+    
+    def put(self, barcode: str, name: str, visit_count: int, last_visit_date: str):
+        """来場者を追加・更新"""
+        with self._lock:
+            self._entries[barcode] = (name, visit_count, last_visit_date)
+            self._entries.move_to_end(barcode)
+            if self.max_entries is not None:
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+    
+    def invalidate(self, barcode: Optional[str] = None):
+        """指定した来場者（省略時は全件）をキャッシュから削除"""
+        with self._lock:
+            if barcode is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(barcode, None)
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    def get_statistics(self) -> Dict:
+        """ヒット/ミスなどのカウンターを取得"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0
+            }
+
 class VisitorDatabase:
-    def __init__(self, db_path: str = "visitors.db"):
+    # 接続ごとに適用する設定
+    BUSY_TIMEOUT_MS = 5000
+    CACHE_SIZE_KIB = 16384
+    # 来場者キャッシュの既定の上限件数
+    VISITOR_CACHE_SIZE = 200000
+    # SQLITE_BUSY 時の再試行（busy_timeout で待っても取れなかった場合）
+    BUSY_RETRY_ATTEMPTS = 5
+    BUSY_RETRY_BASE_DELAY = 0.05
+    # エクスポート時にカーソルから一度に読み込む行数と、列幅の算出に使う先頭行数
+    EXPORT_CHUNK_SIZE = 1000
+    EXPORT_WIDTH_SAMPLE_ROWS = 1000
+    # 一括インポート時に executemany へ渡す行数
+    IMPORT_CHUNK_SIZE = 10000
+    # 来場履歴の画面表示で1回に読む行数
+    VISITS_PAGE_SIZE = 200
+    # 時間帯別の来場数で一度に返す区間数の上限と、期間が長いときに切り替える区切り（分）
+    MAX_ARRIVAL_BUCKETS = 2000
+    ARRIVAL_BUCKET_MINUTES = (5, 15, 60, 180, 360, 1440, 10080)
+    # 来場者検索で返す最大件数
+    SEARCH_LIMIT = 50
+    # 全文検索索引（trigram）で探せる検索語の最小文字数。これより短い語は氏名を順に調べる
+    SEARCH_MIN_INDEXED_LENGTH = 3
+    # 事前登録ファイルの見出しとして認識する列名
+    REGISTRATION_BARCODE_HEADERS = ('barcode', 'バーコード', 'id', '受付番号')
+    REGISTRATION_NAME_HEADERS = ('name', '氏名', '名前', 'お名前')
+    
+    def __init__(self, db_path: str = "visitors.db", visitor_cache_size: Optional[int] = VISITOR_CACHE_SIZE):
         self.db_path = db_path
+        self._local = threading.local()
+        self._connections = []
+        self._connections_lock = threading.Lock()
+        self.cache = VisitorCache(visitor_cache_size)
         self.init_database()
+        self.preload_cache()
+    
+    def _connect(self) -> sqlite3.Connection:
+        """新しい接続を作成してPRAGMAを設定"""
+        # 接続はスレッドごとに専有するが、close() は別スレッドから呼ばれるため
+        # check_same_thread を無効にしている
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=self.BUSY_TIMEOUT_MS / 1000,
+            check_same_thread=False
+        )
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute(f'PRAGMA cache_size=-{self.CACHE_SIZE_KIB}')
+        conn.execute(f'PRAGMA busy_timeout={self.BUSY_TIMEOUT_MS}')
+        conn.execute('PRAGMA temp_store=MEMORY')
+        return conn
+    
+    def get_connection(self) -> sqlite3.Connection:
+        """呼び出し元スレッド専用の接続を取得（なければ作成）"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._connect()
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+    
+    def release_connection(self):
+        """呼び出し元スレッドの接続を閉じる（ワーカースレッド終了時用）"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            return
+        self._local.conn = None
+        with self._connections_lock:
+            if conn in self._connections:
+                self._connections.remove(conn)
+        conn.close()
+    
+    def close(self):
+        """全スレッドの接続を閉じる（アプリケーション終了時に呼び出す）"""
+        with self._connections_lock:
+            connections = self._connections
+            self._connections = []
+        for conn in connections:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+        self._local = threading.local()
     
     def init_database(self):
         """データベースとテーブルを初期化"""
-        conn = sqlite3.connect(self.db_path)
+        conn = self.get_connection()
         cursor = conn.cursor()
         
         # 来場者マスタテーブル
@@ -38,7 +364,37 @@ class VisitorDatabase:
         ''')
         
         conn.commit()
-        conn.close()
+        
+        self.migrate()
+    
+    def get_schema_version(self) -> int:
+        """適用済みのスキーマバージョンを取得"""
+        conn = self.get_connection()
+        return conn.execute('PRAGMA user_version').fetchone()[0]
+    
+    def migrate(self):
+        """未適用のマイグレーションを順番に適用"""
+        conn = self.get_connection()
+        
+        for version, description, statements in MIGRATIONS:
+            if version <= self.get_schema_version():
+                continue
+            
+            # 複数端末が同時に起動しても二重適用しないよう、書き込みロックを取ってから再確認
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                if version <= self.get_schema_version():
+                    conn.rollback()
+                    continue
+                for statement in statements:
+                    conn.execute(statement)
+                conn.execute(f'PRAGMA user_version = {int(version)}')
+                conn.commit()
+            except Exception as e:
+                conn.rollback()
+                raise RuntimeError(
+                    f"マイグレーション {version} ({description}) に失敗しました: {str(e)}"
+                ) from e
     
     def check_in(self, barcode: str, name: str) -> Tuple[bool, int, str]:
         """
@@ -47,189 +403,909 @@ class VisitorDatabase:
         Returns:
             Tuple[is_first_visit, visit_count, last_visit_date]
         """
-        conn = sqlite3.connect(self.db_path)
+        result = self.check_in_many([(barcode, name)])[0]
+        if isinstance(result, Exception):
+            raise result
+        return result
+    
+    def check_in_many(self, requests: List[Tuple[str, str]]) -> List:
+        """
+        複数のチェックインを1つのトランザクション（1回のコミット）で処理
+        
+        1件の失敗が他のチェックインを巻き込まないよう、各チェックインはセーブポイント内で実行する。
+        他の端末が書き込み中でロックが取れない場合は、間隔を広げながら再試行する。
+        
+        Returns:
+            requests と同じ順序のリスト。各要素は check_in と同じタプル、または発生した例外
+        """
+        for attempt in range(self.BUSY_RETRY_ATTEMPTS):
+            try:
+                return self._check_in_many_once(requests)
+            except sqlite3.OperationalError as e:
+                if not self._is_busy_error(e) or attempt == self.BUSY_RETRY_ATTEMPTS - 1:
+                    raise
+                delay = self.BUSY_RETRY_BASE_DELAY * (2 ** attempt)
+                time.sleep(delay + random.uniform(0, delay))
+    
+    @staticmethod
+    def _is_busy_error(error: sqlite3.OperationalError) -> bool:
+        """データベースのロック待ちによるエラーかどうか"""
+        error_name = getattr(error, 'sqlite_errorname', '')
+        if error_name:
+            return error_name.startswith(('SQLITE_BUSY', 'SQLITE_LOCKED'))
+        return 'locked' in str(error) or 'busy' in str(error)
+    
+    def _check_in_many_once(self, requests: List[Tuple[str, str]]) -> List:
+        conn = self.get_connection()
         cursor = conn.cursor()
+        results = []
+        cache_updates = []
+        
+        try:
+            cursor.execute('BEGIN IMMEDIATE')
+            for barcode, name in requests:
+                # 時計は1回だけ読み、日付・時刻の文字列も同じ値から作る
+                visited_at = int(time.time())
+                now = datetime.fromtimestamp(visited_at)
+                cursor.execute('SAVEPOINT check_in')
+                try:
+                    result, stored_name = self._check_in_one(cursor, barcode, name, now, visited_at)
+                    cursor.execute('RELEASE SAVEPOINT check_in')
+                except sqlite3.Error as e:
+                    if isinstance(e, sqlite3.OperationalError) and self._is_busy_error(e):
+                        raise
+                    cursor.execute('ROLLBACK TO SAVEPOINT check_in')
+                    cursor.execute('RELEASE SAVEPOINT check_in')
+                    results.append(e)
+                    continue
+                results.append(result)
+                cache_updates.append((barcode, stored_name, result[1], now.strftime('%Y-%m-%d %H:%M:%S')))
+            conn.commit()
+        except Exception as e:
+            if conn.in_transaction:
+                conn.rollback()
+            raise e
+        
+        # コミットが成功してからキャッシュへ反映（ライトスルー）
+        for barcode, name, visit_count, last_visit_date in cache_updates:
+            self.cache.put(barcode, name, visit_count, last_visit_date)
+        
+        return results
+    
+    def _check_in_one(self, cursor: sqlite3.Cursor, barcode: str, name: str,
+                      now: datetime, visited_at: int) -> Tuple[Tuple[bool, int, str], str]:
+        """
+        チェックイン1件分の書き込み（トランザクション内で呼び出す。now は visited_at のローカル時刻）
+        
+        Returns:
+            (check_in の結果, visitors に保存されている氏名)。登録済みの来場者は name ではなく登録名のまま
+        """
+        current_date = now.strftime('%Y-%m-%d')
+        current_time = now.strftime('%H:%M:%S')
+        current_datetime = now.strftime('%Y-%m-%d %H:%M:%S')
+        
+        # 初回/再来場の判定・来場回数の加算・前回来場日時の取得を1文で行う
+        # （事前登録済みの来場者は visit_count = 0 で登録されているため、1回目のチェックインで初回になる）
+        cursor.execute('''
+            INSERT INTO visitors (barcode, name, first_visit_date, visit_count, last_visit_date)
+            VALUES (?, ?, ?, 1, ?)
+            ON CONFLICT(barcode) DO UPDATE SET
+                visit_count = visit_count + 1,
+                first_visit_date = CASE WHEN visit_count = 0
+                                        THEN excluded.first_visit_date ELSE first_visit_date END,
+                previous_visit_date = NULLIF(last_visit_date, ''),
+                last_visit_date = excluded.last_visit_date
+            RETURNING name, visit_count, previous_visit_date
+        ''', (barcode, name, current_datetime, current_datetime))
+        stored_name, visit_count, previous_visit = cursor.fetchone()
+        is_first_visit = visit_count == 1
+        
+        cursor.execute('''
+            INSERT INTO visit_history (barcode, name, visit_date, visit_time, is_first_visit, visited_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', (barcode, name, current_date, current_time, 1 if is_first_visit else 0, visited_at))
         
-        current_date = datetime.now().strftime('%Y-%m-%d')
-        current_time = datetime.now().strftime('%H:%M:%S')
-        current_datetime = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        self._record_visit_statistics(cursor, current_date, visited_at, is_first_visit)
         
+        if is_first_visit:
+            return (True, 1, current_datetime), stored_name
+        return (False, visit_count, previous_visit), stored_name
+    
+    def _record_visit_statistics(self, cursor: sqlite3.Cursor, visit_date: str, visited_at: int,
+                                 is_first_visit: bool):
+        """来場1件分を集計テーブルに加算（チェックインと同じトランザクション内で呼び出す）"""
+        first = 1 if is_first_visit else 0
+        cursor.execute('''
+            INSERT INTO daily_stats (visit_date, total_visits, first_visits, returning_visits)
+            VALUES (?, 1, ?, ?)
+            ON CONFLICT(visit_date) DO UPDATE SET
+                total_visits = total_visits + 1,
+                first_visits = first_visits + excluded.first_visits,
+                returning_visits = returning_visits + excluded.returning_visits
+        ''', (visit_date, first, 1 - first))
+        cursor.execute('''
+            INSERT INTO minute_stats (minute, total_visits, first_visits, returning_visits)
+            VALUES (?, 1, ?, ?)
+            ON CONFLICT(minute) DO UPDATE SET
+                total_visits = total_visits + 1,
+                first_visits = first_visits + excluded.first_visits,
+                returning_visits = returning_visits + excluded.returning_visits
+        ''', (visited_at // 60, first, 1 - first))
+        cursor.execute('''
+            INSERT INTO stats_totals (id, total_visitors, total_visits)
+            VALUES (1, ?, 1)
+            ON CONFLICT(id) DO UPDATE SET
+                total_visitors = total_visitors + excluded.total_visitors,
+                total_visits = total_visits + 1
+        ''', (first,))
+    
+    def rebuild_statistics(self):
+        """集計テーブルを来場履歴から、氏名検索の索引を来場者マスタから作り直す"""
+        conn = self.get_connection()
+        conn.execute('BEGIN IMMEDIATE')
         try:
-            # 既存の来場者かチェック
-            cursor.execute(
-                'SELECT visit_count, last_visit_date FROM visitors WHERE barcode = ?',
-                (barcode,)
-            )
-            result = cursor.fetchone()
-            
-            if result is None:
-                # 初回来場
-                cursor.execute('''
-                    INSERT INTO visitors (barcode, name, first_visit_date, visit_count, last_visit_date)
-                    VALUES (?, ?, ?, 1, ?)
-                ''', (barcode, name, current_datetime, current_datetime))
-                
-                cursor.execute('''
-                    INSERT INTO visit_history (barcode, name, visit_date, visit_time, is_first_visit)
-                    VALUES (?, ?, ?, ?, 1)
-                ''', (barcode, name, current_date, current_time))
-                
-                conn.commit()
-                return True, 1, current_datetime
-            else:
-                # 再来場
-                visit_count, last_visit = result
-                new_count = visit_count + 1
-                
-                cursor.execute('''
-                    UPDATE visitors 
-                    SET visit_count = ?, last_visit_date = ?
-                    WHERE barcode = ?
-                ''', (new_count, current_datetime, barcode))
-                
-                cursor.execute('''
-                    INSERT INTO visit_history (barcode, name, visit_date, visit_time, is_first_visit)
-                    VALUES (?, ?, ?, ?, 0)
-                ''', (barcode, name, current_date, current_time))
-                
-                conn.commit()
-                return False, new_count, last_visit
-                
+            for statement in (REBUILD_STATISTICS_SQL + REBUILD_MINUTE_STATISTICS_SQL
+                              + REBUILD_SEARCH_INDEX_SQL):
+                conn.execute(statement)
+            conn.commit()
         except Exception as e:
             conn.rollback()
             raise e
-        finally:
-            conn.close()
     
-    def get_visitor_info(self, barcode: str) -> Optional[Dict]:
-        """来場者情報を取得"""
-        conn = sqlite3.connect(self.db_path)
+    def preload_cache(self):
+        """来場者キャッシュを一括で読み込む（上限がある場合は最近の来場者を優先）"""
+        conn = self.get_connection()
         cursor = conn.cursor()
         
+        limit = self.cache.max_entries if self.cache.max_entries is not None else -1
+        cursor.execute('''
+            SELECT barcode, name, visit_count, last_visit_date
+            FROM visitors
+            ORDER BY last_visit_date DESC
+            LIMIT ?
+        ''', (limit,))
+        rows = cursor.fetchall()
+        
+        # 古い順に追加して、最近の来場者ほど破棄されにくくする
+        self.cache.invalidate()
+        for barcode, name, visit_count, last_visit_date in reversed(rows):
+            self.cache.put(barcode, name, visit_count, last_visit_date)
+    
+    def get_visitor_name(self, barcode: str) -> Optional[str]:
+        """来場者の氏名を取得（キャッシュを優先し、なければデータベースから読み込む）"""
+        entry = self.cache.get(barcode)
+        if entry is not None:
+            return entry[0]
+        
+        conn = self.get_connection()
+        result = conn.execute(
+            'SELECT name, visit_count, last_visit_date FROM visitors WHERE barcode = ?',
+            (barcode,)
+        ).fetchone()
+        if result is None:
+            return None
+        
+        self.cache.put(barcode, *result)
+        return result[0]
+    
+    def get_visitor(self, barcode: str) -> Optional[Visitor]:
+        """来場者情報を取得（未登録なら None）"""
+        cursor = self.get_connection().cursor()
         cursor.execute('''
             SELECT barcode, name, first_visit_date, visit_count, last_visit_date
             FROM visitors WHERE barcode = ?
         ''', (barcode,))
+        row = cursor.fetchone()
+        return Visitor._make(row) if row else None
+    
+    def get_visitor_info(self, barcode: str) -> Optional[Dict]:
+        """来場者情報を辞書で取得"""
+        visitor = self.get_visitor(barcode)
+        return visitor._asdict() if visitor else None
+    
+    def search_visitors(self, query: str, limit: int = SEARCH_LIMIT) -> List[Visitor]:
+        """
+        バーコードの前方一致と氏名の部分一致で来場者を検索
         
-        result = cursor.fetchone()
-        conn.close()
+        query を空白で区切った語がすべて氏名に含まれる来場者を、全文検索の順位（bm25）の順に返す。
+        語が1つならバーコードがその語で始まる来場者も探し、氏名で見つかったものより前に並べる。
+        SEARCH_MIN_INDEXED_LENGTH 文字未満の語しかない場合は索引を使えないため氏名を順に調べ、
+        名前がその語で始まるもの、短いものから並べる。氏名では英字の大文字・小文字を区別しないが、
+        バーコードはチェックインと同じく大文字・小文字を区別して前方一致させる。
         
-        if result:
-            return {
-                'barcode': result[0],
-                'name': result[1],
-                'first_visit_date': result[2],
-                'visit_count': result[3],
-                'last_visit_date': result[4]
-            }
-        return None
+        Returns:
+            最大 limit 件の来場者（一致しなければ空のリスト）
+        """
+        terms = query.split()
+        if not terms or limit <= 0:
+            return []
+        cursor = self.get_connection().cursor()
+        
+        results = []
+        if len(terms) == 1:
+            # 主キーの索引を範囲で使う（U+10FFFF を付けた文字列は前方一致するどの値よりも後ろに並ぶ）
+            cursor.execute('''
+                SELECT barcode, name, first_visit_date, visit_count, last_visit_date
+                FROM visitors
+                WHERE barcode >= ? AND barcode < ?
+                ORDER BY barcode
+                LIMIT ?
+            ''', (terms[0], terms[0] + '\U0010ffff', limit))
+            results.extend(map(Visitor._make, cursor.fetchall()))
+        
+        # 短い語は LIKE で絞り込む（索引で探せる語があれば、その結果に対してだけ調べる）
+        indexed = [term for term in terms if len(term) >= self.SEARCH_MIN_INDEXED_LENGTH]
+        short = [term for term in terms if len(term) < self.SEARCH_MIN_INDEXED_LENGTH]
+        conditions = ''.join(" AND v.name LIKE ? ESCAPE '\\'" for _ in short)
+        params = [f'%{self._escape_like(term)}%' for term in short]
+        # バーコードで見つかった来場者と重なる分を除いても limit 件そろうように多めに取る
+        name_limit = limit + len(results)
+        if indexed:
+            match = ' '.join('"' + term.replace('"', '""') + '"' for term in indexed)
+            cursor.execute(f'''
+                SELECT v.barcode, v.name, v.first_visit_date, v.visit_count, v.last_visit_date
+                FROM visitors_fts
+                JOIN visitors AS v ON v.rowid = visitors_fts.rowid
+                WHERE visitors_fts MATCH ?{conditions}
+                ORDER BY visitors_fts.rank
+                LIMIT ?
+            ''', [match, *params, name_limit])
+        else:
+            cursor.execute(f'''
+                SELECT v.barcode, v.name, v.first_visit_date, v.visit_count, v.last_visit_date
+                FROM visitors AS v
+                WHERE 1{conditions}
+                ORDER BY v.name LIKE ? ESCAPE '\\' DESC, length(v.name), v.name
+                LIMIT ?
+            ''', [*params, f'{self._escape_like(short[0])}%', name_limit])
+        
+        found = {visitor.barcode for visitor in results}
+        for visitor in map(Visitor._make, cursor.fetchall()):
+            if visitor.barcode not in found:
+                found.add(visitor.barcode)
+                results.append(visitor)
+        return results[:limit]
+    
+    @staticmethod
+    def _escape_like(text: str) -> str:
+        """LIKE で文字どおりに一致させるため % _ \\ をエスケープ（ESCAPE '\\' と組み合わせて使う）"""
+        return text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    
+    def iter_today_visits(self, chunk_size: Optional[int] = None) -> Iterator[Visit]:
+        """本日の来場履歴を新しい順に Visit で少しずつ返す"""
+        cursor = self._select_today_visits(self.get_connection().cursor())
+        yield from self._iter_cursor(cursor, chunk_size, Visit)
     
     def get_today_visitors(self) -> List[Dict]:
         """本日の来場者リストを取得"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        today = datetime.now().strftime('%Y-%m-%d')
+        # 辞書は行のタプルから直接作る（Visit を経由すると1行ごとに余分なオブジェクトができる）
+        cursor = self._select_today_visits(self.get_connection().cursor())
+        return [
+            {
+                'barcode': barcode,
+                'name': name,
+                'visit_time': visit_time,
+                'is_first_visit': bool(is_first_visit)
+            }
+            for _, barcode, name, _, visit_time, is_first_visit in self._iter_cursor(cursor)
+        ]
+    
+    def get_visits(self, start: TimePoint, end: TimePoint, barcode: Optional[str] = None,
+                   limit: Optional[int] = None) -> List[Visit]:
+        """
+        start 以上 end 未満に来場した履歴を古い順に取得（visited_at のインデックスで範囲検索）
         
-        cursor.execute('''
-            SELECT barcode, name, visit_time, is_first_visit
+        Args:
+            start, end: datetime（タイムゾーンなしはローカル時刻）/ date（その日の0時）/ UNIX 時刻（秒）
+            barcode: 指定するとその来場者の履歴だけ
+            limit: 最大件数（省略時は制限なし）
+        """
+        visits = self.iter_visits_between(start, end, barcode)
+        return list(islice(visits, limit) if limit is not None else visits)
+    
+    def iter_visits_between(self, start: TimePoint, end: TimePoint, barcode: Optional[str] = None,
+                            chunk_size: Optional[int] = None) -> Iterator[Visit]:
+        """get_visits と同じ範囲の来場履歴を Visit で少しずつ返す"""
+        sql = '''
+            SELECT id, barcode, name, visit_date, visit_time, is_first_visit
             FROM visit_history
-            WHERE visit_date = ?
-            ORDER BY visit_time DESC
-        ''', (today,))
+            WHERE visited_at >= ? AND visited_at < ?
+        '''
+        params = [self._to_epoch(start), self._to_epoch(end)]
+        if barcode is not None:
+            sql += ' AND barcode = ?'
+            params.append(barcode)
+        sql += ' ORDER BY visited_at, id'
+        cursor = self.get_connection().cursor()
+        cursor.execute(sql, params)
+        yield from self._iter_cursor(cursor, chunk_size, Visit)
+    
+    def count_visits(self, start: TimePoint, end: TimePoint) -> int:
+        """start 以上 end 未満の来場回数"""
+        cursor = self.get_connection().cursor()
+        cursor.execute('''
+            SELECT COUNT(*) FROM visit_history WHERE visited_at >= ? AND visited_at < ?
+        ''', (self._to_epoch(start), self._to_epoch(end)))
+        return cursor.fetchone()[0]
+    
+    def get_arrival_buckets(self, start: TimePoint, end: TimePoint,
+                            bucket_minutes: int = 15) -> List[ArrivalBucket]:
+        """
+        start 以上 end 未満を bucket_minutes 分ごとに区切った来場数（古い順）
         
-        results = cursor.fetchall()
-        conn.close()
+        来場履歴は読まず、チェックインのたびに加算している minute_stats から集計する。
+        区間は start から数えて区切り、来場のない区間も 0 件で含める。
+        区間が MAX_ARRIVAL_BUCKETS を超える場合は ValueError（arrival_bucket_minutes() で
+        期間に合った区切りを選べる）。
+        """
+        if bucket_minutes < 1:
+            raise ValueError("bucket_minutes は1以上を指定してください")
+        start_minute = self._to_epoch(start) // 60
+        end_minute = -(-self._to_epoch(end) // 60)
+        count = max(0, -(-(end_minute - start_minute) // bucket_minutes))
+        if count > self.MAX_ARRIVAL_BUCKETS:
+            raise ValueError(
+                f"区間が多すぎます（{count}件、上限 {self.MAX_ARRIVAL_BUCKETS}件）。"
+                f"bucket_minutes を {self.arrival_bucket_minutes(start, end, bucket_minutes)} 以上にしてください"
+            )
+        totals = [[0, 0, 0] for _ in range(count)]
+        
+        cursor = self.get_connection().cursor()
+        cursor.execute('''
+            SELECT (minute - ?) / ?, SUM(total_visits), SUM(first_visits), SUM(returning_visits)
+            FROM minute_stats
+            WHERE minute >= ? AND minute < ?
+            GROUP BY 1
+        ''', (start_minute, bucket_minutes, start_minute, end_minute))
+        for index, total, first, returning in cursor:
+            totals[index] = [total, first, returning]
         
         return [
-            {
-                'barcode': r[0],
-                'name': r[1],
-                'visit_time': r[2],
-                'is_first_visit': bool(r[3])
-            }
-            for r in results
+            ArrivalBucket((start_minute + i * bucket_minutes) * 60, *bucket)
+            for i, bucket in enumerate(totals)
         ]
     
+    @classmethod
+    def arrival_bucket_minutes(cls, start: TimePoint, end: TimePoint, minimum: int = 5) -> int:
+        """
+        start 以上 end 未満を区切っても MAX_ARRIVAL_BUCKETS を超えない区切り（分）
+        
+        minimum 以上で条件を満たす ARRIVAL_BUCKET_MINUTES のうち最小のものを返す
+        （どれも超える長さなら、上限にちょうど収まる分数）。
+        """
+        minutes = max(0, -(-cls._to_epoch(end) // 60) - cls._to_epoch(start) // 60)
+        for bucket_minutes in cls.ARRIVAL_BUCKET_MINUTES:
+            if bucket_minutes >= minimum and -(-minutes // bucket_minutes) <= cls.MAX_ARRIVAL_BUCKETS:
+                return bucket_minutes
+        return max(minimum, -(-minutes // cls.MAX_ARRIVAL_BUCKETS))
+    
+    def get_peak_minute(self, start: TimePoint, end: TimePoint) -> Optional[ArrivalBucket]:
+        """start 以上 end 未満で来場が最も多かった1分間（同数なら早い方。来場がなければ None）"""
+        cursor = self.get_connection().cursor()
+        cursor.execute('''
+            SELECT minute * 60, total_visits, first_visits, returning_visits
+            FROM minute_stats
+            WHERE minute >= ? AND minute < ?
+            ORDER BY total_visits DESC, minute
+            LIMIT 1
+        ''', (self._to_epoch(start) // 60, -(-self._to_epoch(end) // 60)))
+        row = cursor.fetchone()
+        return ArrivalBucket._make(row) if row else None
+    
+    @staticmethod
+    def _to_epoch(value: TimePoint) -> int:
+        """datetime / date / UNIX 時刻を visited_at と同じ UNIX 時刻（秒）に変換"""
+        if isinstance(value, datetime):
+            return int(value.timestamp())
+        if isinstance(value, date):
+            return int(datetime.combine(value, datetime.min.time()).timestamp())
+        return int(value)
+    
+    def get_visits_page(self, visit_date: str, after: Optional[Tuple[str, int]] = None,
+                        limit: int = VISITS_PAGE_SIZE) -> List[Visit]:
+        """
+        指定日の来場履歴を新しい順に limit 件ずつ取得（キーセット方式のページ送り）
+        
+        Args:
+            visit_date: 'YYYY-MM-DD'
+            after: 前のページの最後の行の (visit_time, id)。省略時は先頭ページ
+        """
+        cursor = self.get_connection().cursor()
+        if after is None:
+            cursor.execute('''
+                SELECT id, barcode, name, visit_date, visit_time, is_first_visit
+                FROM visit_history
+                WHERE visit_date = ?
+                ORDER BY visit_time DESC, id DESC
+                LIMIT ?
+            ''', (visit_date, limit))
+        else:
+            cursor.execute('''
+                SELECT id, barcode, name, visit_date, visit_time, is_first_visit
+                FROM visit_history
+                WHERE visit_date = ? AND (visit_time, id) < (?, ?)
+                ORDER BY visit_time DESC, id DESC
+                LIMIT ?
+            ''', (visit_date, after[0], after[1], limit))
+        return list(map(Visit._make, cursor.fetchall()))
+    
+    def get_visits_after_id(self, visit_date: str, after_id: int) -> List[Visit]:
+        """指定日の来場履歴のうち id が after_id より大きいもの（新しい順）"""
+        cursor = self.get_connection().cursor()
+        if after_id <= 0:
+            # まだ1件も読んでいない（その日の来場がない）場合は日付のインデックスで読む
+            cursor.execute('''
+                SELECT id, barcode, name, visit_date, visit_time, is_first_visit
+                FROM visit_history
+                WHERE visit_date = ?
+                ORDER BY visit_time DESC, id DESC
+            ''', (visit_date,))
+        else:
+            # 新しく追加された数件だけを主キーの範囲で読む（日付のインデックスは使わない）
+            cursor.execute('''
+                SELECT id, barcode, name, visit_date, visit_time, is_first_visit
+                FROM visit_history
+                WHERE id > ? AND +visit_date = ?
+                ORDER BY visit_time DESC, id DESC
+            ''', (after_id, visit_date))
+        return list(map(Visit._make, cursor.fetchall()))
+    
     def get_statistics(self) -> Dict:
-        """統計情報を取得"""
-        conn = sqlite3.connect(self.db_path)
+        """統計情報を取得（集計テーブルから1行読むだけ）"""
+        conn = self.get_connection()
         cursor = conn.cursor()
         
         today = datetime.now().strftime('%Y-%m-%d')
         
-        # 総来場者数
-        cursor.execute('SELECT COUNT(*) FROM visitors')
-        total_visitors = cursor.fetchone()[0]
-        
-        # 本日の来場者数
-        cursor.execute('''
-            SELECT COUNT(*) FROM visit_history WHERE visit_date = ?
-        ''', (today,))
-        today_visitors = cursor.fetchone()[0]
-        
-        # 本日の初回来場者数
         cursor.execute('''
-            SELECT COUNT(*) FROM visit_history 
-            WHERE visit_date = ? AND is_first_visit = 1
+            SELECT t.total_visitors, t.total_visits,
+                   COALESCE(d.total_visits, 0), COALESCE(d.first_visits, 0),
+                   COALESCE(d.returning_visits, 0)
+            FROM stats_totals t
+            LEFT JOIN daily_stats d ON d.visit_date = ?
+            WHERE t.id = 1
         ''', (today,))
-        today_first_visitors = cursor.fetchone()[0]
-        
-        # 総来場回数
-        cursor.execute('SELECT COUNT(*) FROM visit_history')
-        total_visits = cursor.fetchone()[0]
-        
-        conn.close()
+        result = cursor.fetchone() or (0, 0, 0, 0, 0)
+        total_visitors, total_visits, today_visitors, today_first, today_returning = result
         
         return {
             'total_visitors': total_visitors,
             'today_visitors': today_visitors,
-            'today_first_visitors': today_first_visitors,
-            'today_returning_visitors': today_visitors - today_first_visitors,
+            'today_first_visitors': today_first,
+            'today_returning_visitors': today_returning,
             'total_visits': total_visits
         }
     
-    def export_to_excel(self, file_path: str):
-        """データをExcelにエクスポート"""
-        import openpyxl
-        from openpyxl import Workbook
+    def iter_visitor_rows(self, chunk_size: Optional[int] = None) -> Iterator[Tuple]:
+        """来場者マスタを VISITOR_COLUMNS の順のタプルで少しずつ返す"""
+        cursor = self._select_all_visitors(self.get_connection().cursor())
+        yield from self._iter_cursor(cursor, chunk_size)
+    
+    def iter_visitors(self, chunk_size: Optional[int] = None) -> Iterator[Visitor]:
+        """来場者マスタをバーコード順に Visitor で少しずつ返す"""
+        cursor = self._select_all_visitors(self.get_connection().cursor())
+        yield from self._iter_cursor(cursor, chunk_size, Visitor)
+    
+    def iter_visits(self, date_from: Optional[str] = None, date_to: Optional[str] = None,
+                    chunk_size: Optional[int] = None) -> Iterator[Visit]:
+        """来場履歴を古い順に Visit で少しずつ返す（期間は iter_visit_rows と同じ）"""
+        cursor = self._select_visits(self.get_connection().cursor(), date_from, date_to)
+        yield from self._iter_cursor(cursor, chunk_size, Visit)
+    
+    def iter_visit_rows(self, date_from: Optional[str] = None, date_to: Optional[str] = None,
+                        chunk_size: Optional[int] = None) -> Iterator[Tuple]:
+        """
+        来場履歴を VISIT_COLUMNS の順のタプルで古い順に少しずつ返す
         
-        wb = Workbook()
+        Args:
+            date_from, date_to: 'YYYY-MM-DD' 形式の期間（両端を含む）。省略時は制限なし
+        """
+        cursor = self._select_visits(self.get_connection().cursor(), date_from, date_to)
+        yield from self._iter_cursor(cursor, chunk_size)
+    
+    @staticmethod
+    def _select_all_visitors(cursor: sqlite3.Cursor) -> sqlite3.Cursor:
+        return cursor.execute('''
+            SELECT barcode, name, first_visit_date, visit_count, last_visit_date
+            FROM visitors ORDER BY barcode
+        ''')
+    
+    @staticmethod
+    def _select_today_visits(cursor: sqlite3.Cursor) -> sqlite3.Cursor:
+        return cursor.execute('''
+            SELECT id, barcode, name, visit_date, visit_time, is_first_visit
+            FROM visit_history
+            WHERE visit_date = ?
+            ORDER BY visit_time DESC
+        ''', (datetime.now().strftime('%Y-%m-%d'),))
+    
+    @staticmethod
+    def _select_visits(cursor: sqlite3.Cursor, date_from: Optional[str],
+                       date_to: Optional[str]) -> sqlite3.Cursor:
+        return cursor.execute('''
+            SELECT id, barcode, name, visit_date, visit_time, is_first_visit
+            FROM visit_history
+            WHERE visit_date >= ? AND visit_date <= ?
+            ORDER BY visit_date, visit_time, id
+        ''', (date_from or '', date_to or '9999-12-31'))
+    
+    def _iter_cursor(self, cursor: sqlite3.Cursor, chunk_size: Optional[int] = None,
+                     record=None) -> Iterator[Tuple]:
+        """
+        カーソルの行を chunk_size 行ずつ読みながら返す
         
-        # 来場者マスタシート
-        ws_visitors = wb.active
-        ws_visitors.title = "来場者マスタ"
-        ws_visitors.append(['バーコード', '氏名', '初回来場日時', '来場回数', '最終来場日時'])
+        record（Visitor / Visit）を指定すると各行をそのレコードに変換する。変換は読み込んだ
+        塊ごとに map(record._make, ...) で行う（行ごとに Python の row_factory を呼ぶより速い）。
+        """
+        chunk_size = chunk_size or self.EXPORT_CHUNK_SIZE
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            if record is not None:
+                yield from map(record._make, rows)
+            else:
+                yield from rows
+    
+    def import_visitors(self, rows: Iterable[Tuple]) -> int:
+        """
+        来場者マスタを一括インポート（同じバーコードは上書き）
+        
+        Args:
+            rows: VISITOR_COLUMNS の順のタプル
         
-        conn = sqlite3.connect(self.db_path)
+        Returns:
+            インポートした行数
+        """
+        conn = self.get_connection()
         cursor = conn.cursor()
+        count = 0
+        rows = iter(rows)
+        
+        cursor.execute('BEGIN IMMEDIATE')
+        try:
+            while True:
+                chunk = list(islice(rows, self.IMPORT_CHUNK_SIZE))
+                if not chunk:
+                    break
+                cursor.executemany('''
+                    INSERT INTO visitors (barcode, name, first_visit_date, visit_count, last_visit_date)
+                    VALUES (?, ?, ?, ?, ?)
+                    ON CONFLICT(barcode) DO UPDATE SET
+                        name = excluded.name,
+                        first_visit_date = excluded.first_visit_date,
+                        visit_count = excluded.visit_count,
+                        last_visit_date = excluded.last_visit_date
+                ''', chunk)
+                count += len(chunk)
+            
+            cursor.execute('''
+                INSERT INTO stats_totals (id, total_visitors, total_visits)
+                VALUES (1, (SELECT COUNT(*) FROM visitors WHERE visit_count > 0), 0)
+                ON CONFLICT(id) DO UPDATE SET total_visitors = excluded.total_visitors
+            ''')
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            raise e
         
-        cursor.execute('SELECT * FROM visitors ORDER BY first_visit_date DESC')
-        for row in cursor.fetchall():
-            ws_visitors.append(row)
+        self.preload_cache()
+        return count
+    
+    def import_visits(self, rows: Iterable[Tuple]) -> int:
+        """
+        来場履歴を一括インポート（ID は新たに採番し、集計テーブルにも加算する）
         
-        # 来場履歴シート
-        ws_history = wb.create_sheet("来場履歴")
-        ws_history.append(['ID', 'バーコード', '氏名', '来場日', '来場時刻', '初回来場'])
+        Args:
+            rows: VISIT_COLUMNS の順のタプル（id は無視される）
         
-        cursor.execute('SELECT * FROM visit_history ORDER BY visit_date DESC, visit_time DESC')
-        for row in cursor.fetchall():
-            ws_history.append(list(row[:5]) + ['初回' if row[5] else '再来場'])
+        Returns:
+            インポートした行数
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        count = 0
+        daily = {}
+        rows = iter(rows)
         
-        conn.close()
+        cursor.execute('BEGIN IMMEDIATE')
+        try:
+            last_id = cursor.execute('SELECT COALESCE(MAX(id), 0) FROM visit_history').fetchone()[0]
+            while True:
+                chunk = [row[1:] for row in islice(rows, self.IMPORT_CHUNK_SIZE)]
+                if not chunk:
+                    break
+                cursor.executemany('''
+                    INSERT INTO visit_history (barcode, name, visit_date, visit_time, is_first_visit,
+                                               visited_at)
+                    VALUES (?1, ?2, ?3, ?4, ?5,
+                            CAST(strftime('%s', ?3 || ' ' || ?4, 'utc') AS INTEGER))
+                ''', chunk)
+                for _, _, visit_date, _, is_first_visit in chunk:
+                    total, first = daily.get(visit_date, (0, 0))
+                    daily[visit_date] = (total + 1, first + (1 if is_first_visit else 0))
+                count += len(chunk)
+            
+            cursor.executemany('''
+                INSERT INTO daily_stats (visit_date, total_visits, first_visits, returning_visits)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT(visit_date) DO UPDATE SET
+                    total_visits = total_visits + excluded.total_visits,
+                    first_visits = first_visits + excluded.first_visits,
+                    returning_visits = returning_visits + excluded.returning_visits
+            ''', [(date, total, first, total - first) for date, (total, first) in daily.items()])
+            # 分別集計は取り込んだ行（last_id より後）から SQL でまとめて加算する
+            cursor.execute('''
+                INSERT INTO minute_stats (minute, total_visits, first_visits, returning_visits)
+                SELECT visited_at / 60, COUNT(*), SUM(is_first_visit), COUNT(*) - SUM(is_first_visit)
+                FROM visit_history
+                WHERE id > ? AND visited_at IS NOT NULL
+                GROUP BY visited_at / 60
+                ON CONFLICT(minute) DO UPDATE SET
+                    total_visits = total_visits + excluded.total_visits,
+                    first_visits = first_visits + excluded.first_visits,
+                    returning_visits = returning_visits + excluded.returning_visits
+            ''', (last_id,))
+            cursor.execute('''
+                INSERT INTO stats_totals (id, total_visitors, total_visits)
+                VALUES (1, 0, ?)
+                ON CONFLICT(id) DO UPDATE SET total_visits = total_visits + excluded.total_visits
+            ''', (count,))
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            raise e
+        
+        return count
+    
+    def import_registrations(self, file_path: str, update_existing: bool = True,
+                             progress_callback=None, encoding: str = 'utf-8-sig') -> Dict:
+        """
+        事前登録者名簿（.xlsx / .csv）を来場者マスタへ一括登録
+        
+        登録された来場者は来場回数 0 として保存され、初回スキャン時から氏名が表示される。
+        ファイルは少しずつ一時テーブルに読み込み、読み終えてから全体を1つのトランザクションで書き込む
+        （書き込みロックを持つのは最後の書き込みの間だけ）。
+        
+        Args:
+            update_existing: True なら登録済みのバーコードの氏名を上書き、False なら変更しない
+            progress_callback: progress_callback(処理した行数, 総行数) の形で随時呼び出される
+                （総行数が分からない場合は 0）
+            encoding: CSV の文字コード
+        
+        Returns:
+            {'imported': 登録・更新した件数, 'skipped': バーコードが空などで読み飛ばした行数}
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        imported = 0
+        skipped = 0
+        processed = 0
+        
+        # 読み込み中は書き込みロックを取らないよう、まず一時テーブルに読み込んでおく
+        # （一時テーブルは接続ごとのため、データベース本体はロックされない）
+        cursor.execute('''
+            CREATE TEMP TABLE IF NOT EXISTS registration_import (
+                barcode TEXT NOT NULL,
+                name TEXT NOT NULL
+            )
+        ''')
+        try:
+            rows, total = self._read_registration_rows(file_path, encoding)
+            try:
+                while True:
+                    chunk = list(islice(rows, self.IMPORT_CHUNK_SIZE))
+                    if not chunk:
+                        break
+                    processed += len(chunk)
+                    records = [record for record in chunk if record is not None]
+                    skipped += len(chunk) - len(records)
+                    cursor.executemany('INSERT INTO registration_import (barcode, name) VALUES (?, ?)',
+                                       records)
+                    imported += len(records)
+                    if progress_callback:
+                        progress_callback(processed, total)
+                conn.commit()
+            except Exception as e:
+                conn.rollback()
+                raise e
+            finally:
+                rows.close()
+            
+            # 来場者マスタへは1つの文でまとめて書き込み、書き込みロックはその間だけ持つ。
+            # ファイル内で重複したバーコードは、上書きするなら最後の行、しないなら最初の行の氏名を
+            # 最初の行の位置で1回だけ書き込む（行の順に適用した場合と同じ結果で、検索索引の更新が減る）
+            if update_existing:
+                name_row = 'last_row'
+                conflict = 'DO UPDATE SET name = excluded.name WHERE name IS NOT excluded.name'
+            else:
+                name_row = 'first_row'
+                conflict = 'DO NOTHING'
+            cursor.execute('BEGIN IMMEDIATE')
+            try:
+                cursor.execute(f'''
+                    WITH picked AS (
+                        SELECT barcode, MIN(rowid) AS first_row, MAX(rowid) AS last_row
+                        FROM registration_import GROUP BY barcode
+                    )
+                    INSERT INTO visitors (barcode, name, first_visit_date, visit_count, last_visit_date)
+                    SELECT p.barcode, r.name, '', 0, ''
+                    FROM picked AS p JOIN registration_import AS r ON r.rowid = p.{name_row}
+                    WHERE true ORDER BY p.first_row
+                    ON CONFLICT(barcode) {conflict}
+                ''')
+                conn.commit()
+            except Exception as e:
+                conn.rollback()
+                raise e
+        finally:
+            cursor.execute('DROP TABLE IF EXISTS temp.registration_import')
+        
+        self.preload_cache()
+        return {'imported': imported, 'skipped': skipped}
+    
+    def _read_registration_rows(self, file_path: str, encoding: str):
+        """名簿ファイルの各行を (バーコード, 氏名) で返すジェネレーターと総行数（不明なら 0）を返す"""
+        extension = os.path.splitext(file_path)[1].lower()
+        if extension in ('.xlsx', '.xlsm'):
+            from openpyxl import load_workbook
+            
+            wb = load_workbook(file_path, read_only=True, data_only=True)
+            ws = wb.active
+            total = max((ws.max_row or 1) - 1, 0)
+            
+            def generate():
+                try:
+                    yield from self._parse_registration_rows(ws.iter_rows(values_only=True))
+                finally:
+                    wb.close()
+            return generate(), total
+        elif extension in ('.csv', '.txt'):
+            import csv
+            
+            def generate():
+                with open(file_path, 'r', encoding=encoding, newline='') as f:
+                    yield from self._parse_registration_rows(csv.reader(f))
+            return generate(), 0
+        else:
+            raise ValueError(f"対応していないファイル形式です: {extension}")
+    
+    def _parse_registration_rows(self, rows) -> Iterator[Optional[Tuple[str, str]]]:
+        """見出し行から列を判定し、(バーコード, 氏名) を返す（読み飛ばす行は None）"""
+        rows = iter(rows)
+        first = next(rows, None)
+        if first is None:
+            return
+        
+        headers = [str(value).strip().lower() if value is not None else '' for value in first]
+        barcode_col = next((i for i, h in enumerate(headers) if h in self.REGISTRATION_BARCODE_HEADERS), None)
+        name_col = next((i for i, h in enumerate(headers) if h in self.REGISTRATION_NAME_HEADERS), None)
+        if barcode_col is None or name_col is None:
+            # 見出しがなければ 1列目をバーコード、2列目を氏名として1行目から読み込む
+            barcode_col, name_col = 0, 1
+            rows = chain([first], rows)
+        
+        for row in rows:
+            barcode = self._registration_cell(row, barcode_col)
+            name = self._registration_cell(row, name_col)
+            yield (barcode, name) if barcode and name else None
+    
+    @staticmethod
+    def _registration_cell(row, index: int) -> str:
+        if index >= len(row) or row[index] is None:
+            return ''
+        value = row[index]
+        # Excel で数値として保存されたバーコード（例: 1001.0）は整数表記にする
+        if isinstance(value, float) and value.is_integer():
+            value = int(value)
+        return str(value).strip()
+    
+    def export_to_excel(self, file_path: str, progress_callback=None, is_cancelled=None):
+        """
+        データをExcelにエクスポート
+        
+        書き込み専用モードのブックにカーソルから少しずつ書き出すため、
+        行数が増えても使用メモリはほぼ一定。読み取りは1つのトランザクション（スナップショット）内で
+        行うため、エクスポート中もチェックインの書き込みは止まらない。
+        
+        Args:
+            progress_callback: progress_callback(書き出した行数, 総行数) の形で随時呼び出される
+            is_cancelled: True を返すとエクスポートを中断して ExportCancelled を送出する。
+                中断時・失敗時にファイルは作成されない
+        """
+        from openpyxl import Workbook
+        
+        wb = Workbook(write_only=True)
+        
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        # 同じディレクトリの一時ファイルに書き出し、完了後に置き換える
+        fd, temp_path = tempfile.mkstemp(
+            suffix='.xlsx', dir=os.path.dirname(os.path.abspath(file_path))
+        )
+        os.close(fd)
+        
+        cursor.execute('BEGIN')
+        try:
+            cursor.execute('''
+                SELECT (SELECT COUNT(*) FROM visitors),
+                       COALESCE((SELECT total_visits FROM stats_totals WHERE id = 1), 0)
+            ''')
+            visitor_rows, history_rows = cursor.fetchone()
+            progress = _ExportProgress(visitor_rows + history_rows, progress_callback, is_cancelled)
+            
+            # 来場者マスタシート
+            ws_visitors = wb.create_sheet("来場者マスタ")
+            cursor.execute('''
+                SELECT barcode, name, first_visit_date, visit_count, last_visit_date
+                FROM visitors ORDER BY first_visit_date DESC
+            ''')
+            self._write_sheet_streaming(
+                ws_visitors,
+                ['バーコード', '氏名', '初回来場日時', '来場回数', '最終来場日時'],
+                cursor,
+                progress=progress
+            )
+            
+            # 来場履歴シート
+            ws_history = wb.create_sheet("来場履歴")
+            cursor.execute('''
+                SELECT id, barcode, name, visit_date, visit_time, is_first_visit
+                FROM visit_history ORDER BY visit_date DESC, visit_time DESC
+            ''')
+            self._write_sheet_streaming(
+                ws_history,
+                ['ID', 'バーコード', '氏名', '来場日', '来場時刻', '初回来場'],
+                cursor,
+                lambda row: list(row[:5]) + ['初回' if row[5] else '再来場'],
+                progress=progress
+            )
+            
+            progress.check_cancelled()
+            wb.save(temp_path)
+            os.replace(temp_path, file_path)
+        except BaseException:
+            # 書きかけのシートの一時ファイルを閉じてから、出力先の一時ファイルを削除する
+            for ws in wb.worksheets:
+                try:
+                    ws.close()
+                except Exception:
+                    pass
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        finally:
+            conn.rollback()
+    
+    def _write_sheet_streaming(self, ws, header: List[str], cursor: sqlite3.Cursor, transform=None,
+                               progress: Optional[_ExportProgress] = None):
+        """カーソルの結果を書き込み専用シートへ分割して書き出す"""
+        from openpyxl.utils import get_column_letter
+        
+        # 書き込み専用シートは行を書き出した後に列幅を変更できないため、先頭行から算出しておく
+        sample = cursor.fetchmany(self.EXPORT_WIDTH_SAMPLE_ROWS)
+        if transform:
+            sample = [transform(row) for row in sample]
+        
+        widths = [len(str(value)) for value in header]
+        for row in sample:
+            for i, value in enumerate(row):
+                widths[i] = max(widths[i], len(str(value)))
+        for i, width in enumerate(widths):
+            ws.column_dimensions[get_column_letter(i + 1)].width = min(width + 2, 50)
+        
+        ws.append(header)
+        for row in sample:
+            ws.append(row)
+        if progress:
+            progress.advance(len(sample))
         
-        # 列幅調整
-        for ws in [ws_visitors, ws_history]:
-            for column in ws.columns:
-                max_length = 0
-                column_letter = column[0].column_letter
-                for cell in column:
-                    try:
-                        if len(str(cell.value)) > max_length:
-                            max_length = len(str(cell.value))
-                    except:
-                        pass
-                adjusted_width = min(max_length + 2, 50)
-                ws.column_dimensions[column_letter].width = adjusted_width
-        
-        wb.save(file_path)
+        while True:
+            rows = cursor.fetchmany(self.EXPORT_CHUNK_SIZE)
+            if not rows:
+                break
+            for row in rows:
+                ws.append(transform(row) if transform else row)
+            if progress:
+                progress.advance(len(rows))
@@ -0,0 +1,267 @@
+from datetime import datetime, timedelta
+
+from PySide6.QtCore import QObject, QThread, QTimer, Signal, Slot
+
+from core.database import VisitorDatabase
+from core.checkin_writer import CheckInWriter
+
+class _DatabaseWorker(QObject):
+    """ワーカースレッド上でデータベース処理を順番に実行する"""
+    job_finished = Signal(object, object, object)  # job, result, error
+    
+    def __init__(self, db: VisitorDatabase):
+        super().__init__()
+        self.db = db
+    
+    @Slot(object)
+    def run_job(self, job):
+        func, args, _ = job
+        try:
+            result = func(*args)
+        except Exception as e:
+            self.job_finished.emit(job, None, e)
+            return
+        self.job_finished.emit(job, result, None)
+    
+    @Slot()
+    def shutdown(self):
+        self.db.release_connection()
+        self.thread().quit()
+
+class DatabaseService(QObject):
+    """
+    データベース処理をGUIスレッドの外で実行するサービス
+    
+    読み取りはワーカースレッドで1件ずつ順番に実行し、チェックインの書き込みは CheckInWriter に渡す。
+    結果はすべてシグナルでGUIスレッドに届く。統計・来場履歴の追加分・時間帯別の来場数・検索など、画面が
+    最新の内容だけを必要とする要求は種類ごとに1件ずつ実行し、実行中に届いた要求は最後の引数で1回だけ
+    実行し直す。不要になった応答は cancel_pending() で捨てられる。
+    """
+    # スキャン/入力されたバーコードの氏名解決結果（氏名が空なら未登録）
+    scan_resolved = Signal(str, str, str)                   # barcode, name, source
+    check_in_finished = Signal(str, str, str, object, object)  # barcode, name, source, result, error
+    stats_ready = Signal(dict)
+    # チェックインのコミット・他の端末からの書き込み・日付の変わり目で最新の統計を通知
+    stats_changed = Signal(dict)
+    # 来場履歴のページ（要求時の visit_date, after と行のリスト）
+    visits_page_ready = Signal(str, object, list)
+    # after_id より新しい来場履歴（要求時の visit_date, after_id と行のリスト）
+    new_visits_ready = Signal(str, int, list)
+    # 時間帯別の来場数（start, end, bucket_minutes, buckets, peak の辞書）
+    arrivals_ready = Signal(dict)
+    # 来場者検索の結果（要求時の query と Visitor のリスト）
+    search_results_ready = Signal(str, list)
+    request_failed = Signal(str, str)                       # operation, message
+    # 処理が BUSY_DELAY_MS 以上かかっている間 True
+    busy_changed = Signal(bool)
+    
+    BUSY_DELAY_MS = 300
+    
+    _job_requested = Signal(object)
+    _shutdown_requested = Signal()
+    _check_in_done = Signal(str, str, str, object)          # barcode, name, source, future
+    
+    def __init__(self, db: VisitorDatabase, parent=None):
+        super().__init__(parent)
+        self.db = db
+        # 書き込みスレッドから直接 emit する（受け手はGUIスレッドなのでキュー経由で届く）
+        self.writer = CheckInWriter(db, on_stats_changed=self.stats_changed.emit)
+        self.writer.start()
+        
+        self._thread = QThread()
+        self._thread.setObjectName("DatabaseService")
+        self._worker = _DatabaseWorker(db)
+        self._worker.moveToThread(self._thread)
+        self._job_requested.connect(self._worker.run_job)
+        self._shutdown_requested.connect(self._worker.shutdown)
+        self._worker.job_finished.connect(self._on_job_finished)
+        self._check_in_done.connect(self._on_check_in_done)
+        self._thread.start()
+        
+        self._pending = 0
+        self._busy = False
+        self._busy_timer = QTimer(self)
+        self._busy_timer.setSingleShot(True)
+        self._busy_timer.timeout.connect(self._on_busy_timeout)
+        
+        # まとめて実行する要求: 実行中の operation / 完了後に実行する (func, args) / 結果を捨てる operation
+        self._coalesced_running = set()
+        self._coalesced_next = {}
+        self._coalesced_cancelled = set()
+        self._closed = False
+        
+        # 日付が変わると「本日」の統計が切り替わるため、0時に統計を読み直す
+        self._midnight_timer = QTimer(self)
+        self._midnight_timer.setSingleShot(True)
+        self._midnight_timer.timeout.connect(self._on_midnight)
+        self._schedule_midnight()
+    
+    # ---- 公開API ----
+    
+    def submit_scan(self, barcode: str, source: str, name: str = ''):
+        """
+        バーコードの氏名を解決し、氏名が分かればチェックインする
+        
+        登録済みの来場者は登録名を、未登録なら name を使う。どちらもなければ氏名なしで
+        scan_resolved を通知し、チェックインは行わない。
+        """
+        self._submit('scan', self._resolve_and_check_in, (barcode, source, name))
+    
+    def refresh_stats(self):
+        """統計情報を再取得（結果は stats_ready）"""
+        self._submit_coalesced('stats', self.db.get_statistics)
+    
+    def load_visits_page(self, visit_date: str, after=None, limit: int = VisitorDatabase.VISITS_PAGE_SIZE):
+        """来場履歴を新しい順に1ページ取得（結果は visits_page_ready）"""
+        self._submit('visits_page', self.db.get_visits_page, (visit_date, after, limit))
+    
+    def load_new_visits(self, visit_date: str, after_id: int):
+        """after_id より後に追加された来場履歴を取得（結果は new_visits_ready）"""
+        self._submit_coalesced('new_visits', self.db.get_visits_after_id, (visit_date, after_id))
+    
+    def load_arrivals(self, start: datetime, end: datetime, bucket_minutes: int):
+        """start 以上 end 未満の時間帯別の来場数とピークの1分間を取得（結果は arrivals_ready）"""
+        self._submit_coalesced('arrivals', self._load_arrivals, (start, end, bucket_minutes))
+    
+    def search_visitors(self, query: str, limit: int = VisitorDatabase.SEARCH_LIMIT):
+        """バーコードの前方一致・氏名の部分一致で来場者を検索（結果は search_results_ready）"""
+        self._submit_coalesced('search', self.db.search_visitors, (query, limit))
+    
+    def cancel_pending(self, operation: str):
+        """
+        まとめて実行する要求（'stats' / 'new_visits' / 'arrivals' / 'search'）の応答待ちを取り消す
+        
+        実行中の要求の結果は通知せず、その後に実行する予定だった要求は捨てる。
+        """
+        self._coalesced_next.pop(operation, None)
+        if operation in self._coalesced_running:
+            self._coalesced_cancelled.add(operation)
+    
+    def close(self):
+        """未書き込みのチェックインをコミットし、ワーカースレッドを停止"""
+        if self._closed:
+            return
+        self._closed = True
+        self._busy_timer.stop()
+        self._midnight_timer.stop()
+        # 先にワーカーを止め、キューに残ったスキャンを書き込みスレッドに渡し終えてから書き込みを閉じる
+        self._shutdown_requested.emit()
+        self._thread.wait()
+        self.writer.close()
+    
+    # ---- ワーカースレッドで実行される処理 ----
+    
+    def _resolve_and_check_in(self, barcode: str, source: str, name: str):
+        registered_name = self.db.get_visitor_name(barcode)
+        name = registered_name or name
+        future = None
+        if name:
+            future = self.writer.submit(barcode, name)
+        return barcode, name, source, future
+    
+    def _load_arrivals(self, start: datetime, end: datetime, bucket_minutes: int) -> dict:
+        return {
+            'start': start,
+            'end': end,
+            'bucket_minutes': bucket_minutes,
+            'buckets': self.db.get_arrival_buckets(start, end, bucket_minutes),
+            'peak': self.db.get_peak_minute(start, end),
+        }
+    
+    # ---- 内部処理（GUIスレッド） ----
+    
+    def _submit(self, operation: str, func, args=()):
+        if self._closed:
+            return
+        self._begin()
+        self._job_requested.emit((func, args, operation))
+    
+    def _submit_coalesced(self, operation: str, func, args=()):
+        if self._closed:
+            return
+        if operation in self._coalesced_running:
+            # 実行中の要求が終わった後に、最後に要求された引数で1回だけ実行する
+            self._coalesced_next[operation] = (func, args)
+            return
+        self._coalesced_running.add(operation)
+        self._submit(operation, func, args)
+    
+    def _begin(self):
+        self._pending += 1
+        if self._pending == 1:
+            self._busy_timer.start(self.BUSY_DELAY_MS)
+    
+    def _end(self):
+        self._pending -= 1
+        if self._pending == 0:
+            self._busy_timer.stop()
+            if self._busy:
+                self._busy = False
+                self.busy_changed.emit(False)
+    
+    def _schedule_midnight(self):
+        now = datetime.now()
+        next_midnight = datetime.combine(now.date() + timedelta(days=1), datetime.min.time())
+        self._midnight_timer.start(int((next_midnight - now).total_seconds() * 1000) + 1000)
+    
+    def _on_midnight(self):
+        self._submit('midnight_stats', self.db.get_statistics)
+        self._schedule_midnight()
+    
+    def _on_busy_timeout(self):
+        if self._pending > 0 and not self._busy:
+            self._busy = True
+            self.busy_changed.emit(True)
+    
+    def _on_job_finished(self, job, result, error):
+        _, args, operation = job
+        
+        if operation == 'scan':
+            if error is not None:
+                # 氏名の解決やキューへの追加に失敗した場合はチェックイン失敗として通知
+                barcode, source, name = args
+                self.check_in_finished.emit(barcode, name, source, None, error)
+            else:
+                barcode, name, source, future = result
+                self.scan_resolved.emit(barcode, name, source)
+                if future is not None:
+                    # チェックインの完了までは処理中として扱う
+                    self._begin()
+                    future.add_done_callback(
+                        lambda f: self._check_in_done.emit(barcode, name, source, f)
+                    )
+        elif operation in self._coalesced_cancelled:
+            self._coalesced_cancelled.discard(operation)
+            self._finish_coalesced(operation)
+        else:
+            if error is not None:
+                self.request_failed.emit(operation, str(error))
+            elif operation == 'stats':
+                self.stats_ready.emit(result)
+            elif operation == 'midnight_stats':
+                self.stats_changed.emit(result)
+            elif operation == 'visits_page':
+                self.visits_page_ready.emit(args[0], args[1], result)
+            elif operation == 'new_visits':
+                self.new_visits_ready.emit(args[0], args[1], result)
+            elif operation == 'arrivals':
+                self.arrivals_ready.emit(result)
+            elif operation == 'search':
+                self.search_results_ready.emit(args[0], result)
+            self._finish_coalesced(operation)
+        
+        self._end()
+    
+    def _finish_coalesced(self, operation: str):
+        if operation not in self._coalesced_running:
+            return
+        self._coalesced_running.discard(operation)
+        pending = self._coalesced_next.pop(operation, None)
+        if pending is not None:
+            self._submit_coalesced(operation, *pending)
+    
+    def _on_check_in_done(self, barcode: str, name: str, source: str, future):
+        error = future.exception()
+        result = None if error else future.result()
+        self.check_in_finished.emit(barcode, name, source, result, error)
+        self._end()
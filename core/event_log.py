@@ -0,0 +1,56 @@
+import logging
+import os
+import queue
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+class EventLog:
+    """
+    来場ログのファイル出力（バックグラウンドスレッドで書き込み）
+    
+    write() はレコードをキューに積むだけで、ファイルへの書き込みとローテーションは
+    QueueListener のスレッドが行う。ファイルが max_bytes バイトを超えると
+    visitors.log.1 〜 visitors.log.<backup_count> に順に退避し、それより古いものは削除する。
+    """
+    DEFAULT_PATH = os.path.join("logs", "visitors.log")
+    DEFAULT_MAX_BYTES = 1024 * 1024
+    DEFAULT_BACKUP_COUNT = 5
+    FORMAT = "%(asctime)s %(levelname)s %(message)s"
+    
+    def __init__(self, path: str = DEFAULT_PATH, max_bytes: int = DEFAULT_MAX_BYTES,
+                 backup_count: int = DEFAULT_BACKUP_COUNT, logger_name: str = "barcode_guest"):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.logger = logging.getLogger(logger_name)
+        self.logger.setLevel(logging.INFO)
+        self.logger.propagate = False
+        self._queue = queue.SimpleQueue()
+        self._queue_handler = QueueHandler(self._queue)
+        self._listener = None
+    
+    def start(self):
+        """書き込みスレッドを開始（ファイルを開けない場合は OSError）"""
+        if self._listener is not None:
+            return
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        file_handler = RotatingFileHandler(self.path, maxBytes=self.max_bytes,
+                                           backupCount=self.backup_count, encoding='utf-8')
+        file_handler.setFormatter(logging.Formatter(self.FORMAT))
+        self._listener = QueueListener(self._queue, file_handler)
+        self._listener.start()
+        self.logger.addHandler(self._queue_handler)
+    
+    def write(self, message: str, level: int = logging.INFO):
+        self.logger.log(level, message)
+    
+    def close(self):
+        """キューに残っている分を書き込んでからファイルを閉じる"""
+        if self._listener is None:
+            return
+        self.logger.removeHandler(self._queue_handler)
+        self._listener.stop()
+        for handler in self._listener.handlers:
+            handler.close()
+        self._listener = None
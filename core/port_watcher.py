@@ -0,0 +1,116 @@
+from typing import Dict, Optional
+
+from PySide6.QtCore import QObject, QThread, QTimer, Signal, Slot
+
+from core.barcode_reader import ScannerReaderThread
+
+class _PortListWorker(QObject):
+    """ワーカースレッド上でシリアルポートの一覧を取得する"""
+    # 識別子 -> ポートの詳細（取得に失敗した場合は None）
+    devices_listed = Signal(object)
+    
+    @Slot()
+    def list_devices(self):
+        try:
+            devices = {device['identity']: device for device in ScannerReaderThread.list_port_details()}
+        except Exception:
+            devices = None
+        self.devices_listed.emit(devices)
+
+class PortWatcher(QObject):
+    """
+    シリアルポートの抜き差しを検出する
+    
+    poll_interval ミリ秒ごとに list_port_details() を取得し、前回との差分を機器の識別子
+    （VID/PID/シリアル番号）単位で通知する。同じ機器が別のポート名で挿し直された場合は
+    removed と added が順に届く。
+    
+    ポートの列挙（Windows では SetupAPI の走査）は数十ミリ秒かかることがあるため
+    ワーカースレッドで行い、GUIスレッドでは結果の差分だけを取る。列挙が終わるまで次の列挙は
+    要求しない。start() 後の最初の一覧は基準として扱い、added は通知せず ports_changed だけを通知する。
+    """
+    device_added = Signal(dict)     # list_port_details() の1件
+    device_removed = Signal(dict)
+    # ポートの一覧が変わったとき（画面のポート一覧の更新用）
+    ports_changed = Signal()
+    
+    _list_requested = Signal()
+    
+    def __init__(self, poll_interval: int = 1000, parent=None):
+        super().__init__(parent)
+        # 最初の一覧が届くまでは None
+        self._devices: Optional[Dict[str, dict]] = None
+        self._listing = False
+        self._timer = QTimer(self)
+        self._timer.setInterval(poll_interval)
+        self._timer.timeout.connect(self.poll)
+        
+        self._thread = QThread()
+        self._thread.setObjectName("PortWatcher")
+        self._worker = _PortListWorker()
+        self._worker.moveToThread(self._thread)
+        self._list_requested.connect(self._worker.list_devices)
+        self._worker.devices_listed.connect(self._on_devices_listed)
+    
+    @property
+    def devices(self) -> Dict[str, dict]:
+        """接続中の機器（識別子 -> ポートの詳細。監視中で最初の一覧が届くまでは空）"""
+        return dict(self._devices or {})
+    
+    def has_devices(self) -> bool:
+        """監視中で、最初の一覧が届いているか"""
+        return self._devices is not None
+    
+    def find_device(self, identity: str):
+        """識別子に一致する接続中の機器（なければ None）"""
+        return (self._devices or {}).get(identity)
+    
+    def start(self):
+        """監視を開始（最初に届いた一覧を基準にする）"""
+        if self._timer.isActive():
+            return
+        self._devices = None
+        self._thread.start()
+        self._timer.start()
+        self.poll()
+    
+    def stop(self):
+        """監視を停止し、列挙中ならその完了を待ってワーカースレッドを終了"""
+        self._timer.stop()
+        self._thread.quit()
+        self._thread.wait()
+        self._listing = False
+        self._devices = None
+    
+    def is_active(self) -> bool:
+        return self._timer.isActive()
+    
+    def poll(self):
+        """ポートの一覧の取得をワーカースレッドに要求（結果は差分として通知）"""
+        if self._listing:
+            return
+        self._listing = True
+        self._list_requested.emit()
+    
+    def _on_devices_listed(self, current: Optional[Dict[str, dict]]):
+        self._listing = False
+        # 停止後に届いた結果や、取得に失敗した場合は何もしない
+        if current is None or not self._timer.isActive():
+            return
+        previous = self._devices
+        self._devices = current
+        if previous is None:
+            self.ports_changed.emit()
+            return
+        
+        changed = False
+        for identity, device in previous.items():
+            if current.get(identity, {}).get('device') != device['device']:
+                self.device_removed.emit(device)
+                changed = True
+        for identity, device in current.items():
+            if previous.get(identity, {}).get('device') != device['device']:
+                self.device_added.emit(device)
+                changed = True
+        if changed:
+            self.ports_changed.emit()
@@ -0,0 +1,65 @@
+import time
+from collections import OrderedDict
+from typing import Optional
+
+class ScanDeduplicator:
+    """
+    同じバーコードの連続読み取りを抑止する
+    
+    スキャナーにバッジをかざしたままにすると同じコードが2〜3回届くため、最後に受け付けてから
+    window 秒以内の同じコードは捨てる。記録は受け付けた順に並べ、期限切れのものは先頭から
+    消していく。件数は max_entries 件までに抑える。window が 0 なら抑止しない。
+    """
+    DEFAULT_WINDOW = 10.0
+    DEFAULT_MAX_ENTRIES = 10000
+    
+    def __init__(self, window: float = DEFAULT_WINDOW, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.window = window
+        self.max_entries = max_entries
+        self._accepted = OrderedDict()
+        self.accepted_count = 0
+        self.suppressed_count = 0
+    
+    def accept(self, barcode: str, now: Optional[float] = None) -> bool:
+        """受け付けるなら True、window 秒以内の重複なら False を返す"""
+        if now is None:
+            now = time.monotonic()
+        self._expire(now)
+        
+        if self.window > 0 and barcode in self._accepted:
+            self.suppressed_count += 1
+            return False
+        
+        self._accepted[barcode] = now
+        self._accepted.move_to_end(barcode)
+        while len(self._accepted) > self.max_entries:
+            self._accepted.popitem(last=False)
+        self.accepted_count += 1
+        return True
+    
+    def set_window(self, window: float):
+        """抑止する秒数を変更（0 で無効）"""
+        self.window = window
+        if window <= 0:
+            self._accepted.clear()
+    
+    def clear(self):
+        self._accepted.clear()
+    
+    def __len__(self) -> int:
+        return len(self._accepted)
+    
+    def get_statistics(self) -> dict:
+        return {
+            'window': self.window,
+            'tracked': len(self._accepted),
+            'accepted': self.accepted_count,
+            'suppressed': self.suppressed_count,
+        }
+    
+    def _expire(self, now: float):
+        while self._accepted:
+            barcode, accepted_at = next(iter(self._accepted.items()))
+            if now - accepted_at < self.window:
+                break
+            del self._accepted[barcode]
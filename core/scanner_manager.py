@@ -0,0 +1,285 @@
+import time
+from collections import deque
+from typing import Dict, List, Optional
+
+from PySide6.QtCore import QObject, QTimer, Signal, Slot
+
+from core.barcode_reader import ScannerReaderThread
+from core.port_watcher import PortWatcher
+
+class ScannerPortState:
+    """1つのポートの状態と読み取り件数"""
+    # 読み取り速度（件/分）を求める期間（秒）
+    RATE_WINDOW = 60.0
+    
+    def __init__(self, port: str, identity: str):
+        self.port = port
+        self.identity = identity
+        # 現在接続しているポート名（挿し直しで変わることがある）
+        self.device = port
+        self.status = 'starting'
+        self.scan_count = 0
+        self.error_count = 0
+        self.last_error = ''
+        self.started_at = time.monotonic()
+        self._recent = deque()
+        
+        # 再接続の計測用
+        self.disconnected_at: Optional[float] = None
+        self.retry_delay = 0.0
+        self.reconnect_count = 0
+        self.last_reconnect_seconds: Optional[float] = None
+        self.dropped_scans = 0
+    
+    def record_scan(self, now: float):
+        self.scan_count += 1
+        self._recent.append(now)
+        self._expire(now)
+    
+    def scans_per_minute(self, now: float) -> float:
+        self._expire(now)
+        window = min(self.RATE_WINDOW, max(now - self.started_at, 1.0))
+        return len(self._recent) * 60.0 / window
+    
+    def _expire(self, now: float):
+        while self._recent and now - self._recent[0] > self.RATE_WINDOW:
+            self._recent.popleft()
+
+class ScannerManager(QObject):
+    """
+    複数のシリアルポートのスキャナーをまとめて管理する
+    
+    ポートごとに ScannerReaderThread を1本ずつ起動する。Windows の COM ポートは select() で
+    まとめて待てないため1スレッドで多重化はせず、各スレッドは read() のタイムアウト待ちで
+    ほぼCPUを使わない。読み取ったバーコードはポート名を付けて barcode_detected で通知する。
+    シグナルはすべてGUIスレッドのイベントキューに届いた順に処理されるため、複数ポートの
+    読み取りも1本の順序付きの流れになる。1つのポートでエラーが起きても他のポートは止まらない。
+    
+    切断されたポートは auto_reconnect が有効なら同じ機器（VID/PID/シリアル番号）を探して
+    再接続する。再試行の間隔は RECONNECT_INITIAL_DELAY 秒から倍々に RECONNECT_MAX_DELAY 秒まで
+    延ばし、PortWatcher が機器の接続を検出したときはすぐに再試行する。再接続先は PortWatcher が
+    ワーカースレッドで取得した最新の一覧から探すため、GUIスレッドでポートを列挙することはない。
+    """
+    barcode_detected = Signal(str, str)     # barcode, port
+    port_error = Signal(str, str)           # port, message
+    port_status_changed = Signal(str, str)  # port, status
+    port_reconnected = Signal(str, str, float)  # port, device, 切断から再接続までの秒数
+    
+    RECONNECT_INITIAL_DELAY = 0.5
+    RECONNECT_MAX_DELAY = 10.0
+    
+    STATUS_NAMES = {
+        'starting': '起動中',
+        'running': '読み取り中',
+        'reconnecting': '再接続待ち',
+        'error': 'エラー',
+        'stopped': '停止',
+    }
+    
+    def __init__(self, baudrate: int = 9600, auto_reconnect: bool = True, parent=None):
+        super().__init__(parent)
+        self.baudrate = baudrate
+        self.auto_reconnect = auto_reconnect
+        self._readers: Dict[str, ScannerReaderThread] = {}
+        self._states: Dict[str, ScannerPortState] = {}
+        self._retry_timers: Dict[str, QTimer] = {}
+        
+        self.watcher = PortWatcher(parent=self)
+        self.watcher.device_added.connect(self._on_device_added)
+        self.watcher.device_removed.connect(self._on_device_removed)
+        self.watcher.ports_changed.connect(self._on_ports_changed)
+    
+    @property
+    def ports(self) -> List[str]:
+        """管理しているポート（起動順）"""
+        return list(self._states)
+    
+    @property
+    def active_ports(self) -> List[str]:
+        """読み取り中、または再接続を待っているポート"""
+        return [port for port, state in self._states.items()
+                if state.status in ('starting', 'running', 'reconnecting')]
+    
+    def start(self, ports: List[str]):
+        """指定したポートの読み取りを開始（起動済みのポートはそのまま）"""
+        if not self.watcher.is_active():
+            self.watcher.start()
+        identities = {device['device']: identity for identity, device in self.watcher.devices.items()}
+        
+        # 停止済みのポートの状態は表示から外す
+        self._states = {port: state for port, state in self._states.items()
+                        if port in self._readers or port in self._retry_timers}
+        for port in ports:
+            if port in self._states:
+                continue
+            self._states[port] = ScannerPortState(port, identities.get(port, port))
+            self._set_status(port, 'starting')
+            self._start_reader(port, port)
+    
+    def stop(self):
+        """すべてのポートの読み取りを停止"""
+        for port in list(self._states):
+            self._cancel_retry(port)
+            self._stop_reader(port)
+            self._set_status(port, 'stopped')
+    
+    def get_port_statistics(self) -> List[dict]:
+        """ポートごとの状態・読み取り件数・読み取り速度（件/分）・再接続の記録"""
+        now = time.monotonic()
+        return [
+            {
+                'port': state.port,
+                'device': state.device,
+                'status': state.status,
+                'status_name': self.STATUS_NAMES.get(state.status, state.status),
+                'scan_count': state.scan_count,
+                'scans_per_minute': state.scans_per_minute(now),
+                'error_count': state.error_count,
+                'last_error': state.last_error,
+                'reconnect_count': state.reconnect_count,
+                'last_reconnect_seconds': state.last_reconnect_seconds,
+                'dropped_scans': state.dropped_scans,
+            }
+            for state in self._states.values()
+        ]
+    
+    def _start_reader(self, port: str, device: str):
+        reader = ScannerReaderThread(port=device, baudrate=self.baudrate)
+        reader.connected.connect(self._on_connected)
+        reader.barcode_detected.connect(self._on_barcode_detected)
+        reader.error_occurred.connect(self._on_error_occurred)
+        self._readers[port] = reader
+        self._states[port].device = device
+        reader.start()
+    
+    def _stop_reader(self, port: str):
+        reader = self._readers.pop(port, None)
+        if reader is None:
+            return
+        reader.connected.disconnect(self._on_connected)
+        reader.barcode_detected.disconnect(self._on_barcode_detected)
+        reader.error_occurred.disconnect(self._on_error_occurred)
+        reader.stop()
+        
+        # 終端が届く前に切断されたスキャンは読み取れない
+        if reader.dropped_bytes:
+            self._states[port].dropped_scans += 1
+    
+    def _set_status(self, port: str, status: str):
+        state = self._states.get(port)
+        if state is None or state.status == status:
+            return
+        state.status = status
+        self.port_status_changed.emit(port, status)
+    
+    def _sender_port(self):
+        # 停止済みのスレッドから遅れて届いたシグナルは無視する
+        reader = self.sender()
+        for port, current in self._readers.items():
+            if current is reader:
+                return port
+        return None
+    
+    @Slot(str)
+    def _on_connected(self, device: str):
+        port = self._sender_port()
+        if port is None:
+            return
+        state = self._states[port]
+        state.retry_delay = 0.0
+        if state.disconnected_at is not None:
+            state.last_reconnect_seconds = time.monotonic() - state.disconnected_at
+            state.reconnect_count += 1
+            state.disconnected_at = None
+            self._set_status(port, 'running')
+            self.port_reconnected.emit(port, device, state.last_reconnect_seconds)
+        else:
+            self._set_status(port, 'running')
+    
+    @Slot(str)
+    def _on_barcode_detected(self, barcode: str):
+        port = self._sender_port()
+        if port is None:
+            return
+        self._states[port].record_scan(time.monotonic())
+        self.barcode_detected.emit(barcode, port)
+    
+    @Slot(str)
+    def _on_error_occurred(self, message: str):
+        port = self._sender_port()
+        if port is None:
+            return
+        self._handle_port_failure(port, message)
+    
+    def _handle_port_failure(self, port: str, message: str):
+        state = self._states[port]
+        was_reconnecting = state.status == 'reconnecting'
+        # 失敗したポートだけを止め、他のポートは読み取りを続ける
+        self._stop_reader(port)
+        if not self.auto_reconnect:
+            state.error_count += 1
+            state.last_error = message
+            self._set_status(port, 'error')
+            self.port_error.emit(port, message)
+            return
+        
+        if not was_reconnecting:
+            # 切断を検出した時点から再接続までの時間を計る
+            state.error_count += 1
+            state.last_error = message
+            state.disconnected_at = time.monotonic()
+            self._set_status(port, 'reconnecting')
+            self.port_error.emit(port, message)
+        self._schedule_retry(port)
+    
+    def _schedule_retry(self, port: str):
+        state = self._states[port]
+        if state.retry_delay:
+            state.retry_delay = min(state.retry_delay * 2, self.RECONNECT_MAX_DELAY)
+        else:
+            state.retry_delay = self.RECONNECT_INITIAL_DELAY
+        
+        timer = self._retry_timers.get(port)
+        if timer is None:
+            timer = QTimer(self)
+            timer.setSingleShot(True)
+            timer.timeout.connect(lambda port=port: self._retry(port))
+            self._retry_timers[port] = timer
+        timer.start(int(state.retry_delay * 1000))
+    
+    def _cancel_retry(self, port: str):
+        timer = self._retry_timers.pop(port, None)
+        if timer is not None:
+            timer.stop()
+            timer.deleteLater()
+    
+    def _retry(self, port: str):
+        state = self._states.get(port)
+        if state is None or state.status != 'reconnecting' or port in self._readers:
+            return
+        device = self.watcher.find_device(state.identity)
+        if device is None:
+            self._schedule_retry(port)
+            return
+        self._cancel_retry(port)
+        self._start_reader(port, device['device'])
+    
+    def _on_device_added(self, device: dict):
+        for port, state in self._states.items():
+            if state.identity == device['identity'] and state.status == 'reconnecting' \
+                    and port not in self._readers:
+                self._retry(port)
+    
+    def _on_ports_changed(self):
+        # 最初の一覧が届く前に起動したポートは、ポート名から機器の識別子を求め直す
+        identities = {device['device']: identity for identity, device in self.watcher.devices.items()}
+        for port, state in self._states.items():
+            if state.identity == port and port in identities:
+                state.identity = identities[port]
+    
+    def _on_device_removed(self, device: dict):
+        # read() がエラーにならない環境でも、取り外しを検出した時点で再接続待ちにする
+        for port, state in list(self._states.items()):
+            if state.identity == device['identity'] and port in self._readers \
+                    and state.status != 'reconnecting':
+                self._handle_port_failure(port, f"{device['device']} が取り外されました")
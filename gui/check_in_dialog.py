@@ -1,68 +1,130 @@
-from PySide6.QtWidgets import QDialog, QVBoxLayout, QLabel
-from PySide6.QtCore import Qt, QTimer
-from PySide6.QtGui import QFont
+from PySide6.QtWidgets import QVBoxLayout, QLabel, QFrame, QWidget
+from PySide6.QtCore import Qt, QTimer, QEvent, Signal
 
-class CheckInDialog(QDialog):
-    """チェックイン結果表示ダイアログ"""
+class CheckInNotification(QFrame):
+    """チェックイン結果の通知（モーダルにせず、一定時間後に自動で消える）"""
+    closed = Signal(object)
     
-    def __init__(self, name: str, is_first_visit: bool, visit_count: int, parent=None):
+    def __init__(self, title: str, message: str, kind: str, timeout_ms: int, parent=None):
         super().__init__(parent)
-        self.setWindowTitle("来場確認")
-        self.setModal(True)
-        
-        # ウィンドウサイズを大きく
-        self.setMinimumSize(600, 400)
+        self.setObjectName("checkInNotification")
+        # kind ('first' / 'returning' / 'error') で CheckInNotificationArea のスタイルを切り替える
+        self.setProperty("kind", kind)
+        self.setFocusPolicy(Qt.NoFocus)
         
         layout = QVBoxLayout(self)
-        layout.setSpacing(30)
-        layout.setContentsMargins(50, 50, 50, 50)
-        
-        # 来場者名
-        name_label = QLabel(name)
-        name_label.setAlignment(Qt.AlignCenter)
-        name_font = QFont()
-        name_font.setPointSize(36)
-        name_font.setBold(True)
-        name_label.setFont(name_font)
-        layout.addWidget(name_label)
+        layout.setSpacing(4)
+        layout.setContentsMargins(20, 12, 20, 12)
         
-        # 初回/再来場表示
-        if is_first_visit:
-            status_label = QLabel("🎉 初回来場 🎉")
-            status_label.setStyleSheet("""
-                QLabel {
-                    background-color: #4CAF50;
-                    color: white;
-                    border-radius: 15px;
-                    padding: 40px;
-                }
-            """)
-        else:
-            status_label = QLabel(f"🔄 {visit_count}回目の来場")
-            status_label.setStyleSheet("""
-                QLabel {
-                    background-color: #2196F3;
-                    color: white;
-                    border-radius: 15px;
-                    padding: 40px;
-                }
-            """)
+        title_label = QLabel(title)
+        title_label.setObjectName("notificationTitle")
+        title_label.setAlignment(Qt.AlignCenter)
+        layout.addWidget(title_label)
         
-        status_label.setAlignment(Qt.AlignCenter)
-        status_font = QFont()
-        status_font.setPointSize(48)
-        status_font.setBold(True)
-        status_label.setFont(status_font)
-        layout.addWidget(status_label)
-        
-        # メッセージ
-        message = "ようこそ！" if is_first_visit else "お帰りなさい！"
         message_label = QLabel(message)
+        message_label.setObjectName("notificationMessage")
         message_label.setAlignment(Qt.AlignCenter)
-        message_font = QFont()
-        message_font.setPointSize(24)
-        message_label.setFont(message_font)
+        message_label.setWordWrap(True)
         layout.addWidget(message_label)
         
-        # 3秒後に自動的に閉じる
-        QTimer.singleShot(3000, self.accept)
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self.dismiss)
+        self._timer.start(timeout_ms)
+    
+    def mousePressEvent(self, event):
+        # クリックですぐに閉じる
+        self.dismiss()
+    
+    def dismiss(self):
+        self._timer.stop()
+        self.closed.emit(self)
+
+class CheckInNotificationArea(QWidget):
+    """
+    チェックイン結果の通知を親ウィジェットの右上に重ねて表示する
+    
+    入力を妨げないよう通知はフォーカスを取らず、新しい通知を上に積む。MAX_VISIBLE 件を超えたら
+    古い通知から消す。表示時間は set_timeout() で変更できる。
+    """
+    MAX_VISIBLE = 3
+    DEFAULT_TIMEOUT_MS = 3000
+    MARGIN = 15
+    
+    STYLE_SHEET = """
+        QFrame#checkInNotification {
+            border-radius: 12px;
+            min-width: 360px;
+            max-width: 480px;
+        }
+        QFrame#checkInNotification[kind="first"] { background-color: #4CAF50; }
+        QFrame#checkInNotification[kind="returning"] { background-color: #2196F3; }
+        QFrame#checkInNotification[kind="error"] { background-color: #f44336; }
+        QLabel#notificationTitle { color: white; font-size: 28px; font-weight: bold; }
+        QLabel#notificationMessage { color: white; font-size: 20px; font-weight: bold; }
+    """
+    
+    def __init__(self, parent: QWidget, timeout_ms: int = DEFAULT_TIMEOUT_MS):
+        super().__init__(parent)
+        self.timeout_ms = timeout_ms
+        self.setStyleSheet(self.STYLE_SHEET)
+        self.setFocusPolicy(Qt.NoFocus)
+        
+        self._layout = QVBoxLayout(self)
+        self._layout.setSpacing(8)
+        self._layout.setContentsMargins(0, 0, 0, 0)
+        self._notifications = []
+        
+        parent.installEventFilter(self)
+        self.hide()
+    
+    def set_timeout(self, timeout_ms: int):
+        """通知の表示時間（ミリ秒）を変更（表示中の通知には影響しない）"""
+        self.timeout_ms = timeout_ms
+    
+    def show_check_in(self, name: str, is_first_visit: bool, visit_count: int):
+        if is_first_visit:
+            self._add(name, "🎉 初回来場 - ようこそ！", 'first')
+        else:
+            self._add(name, f"🔄 {visit_count}回目の来場 - お帰りなさい！", 'returning')
+    
+    def show_error(self, message: str):
+        self._add("エラー", f"❌ {message}", 'error')
+    
+    def clear(self):
+        for notification in list(self._notifications):
+            self._remove(notification)
+    
+    def eventFilter(self, obj, event):
+        if obj is self.parentWidget() and event.type() == QEvent.Resize:
+            self._reposition()
+        return False
+    
+    def _add(self, title: str, message: str, kind: str):
+        notification = CheckInNotification(title, message, kind, self.timeout_ms, self)
+        notification.closed.connect(self._remove)
+        self._notifications.insert(0, notification)
+        self._layout.insertWidget(0, notification)
+        
+        while len(self._notifications) > self.MAX_VISIBLE:
+            self._remove(self._notifications[-1])
+        
+        self.show()
+        self.raise_()
+        self._reposition()
+    
+    def _remove(self, notification):
+        if notification not in self._notifications:
+            return
+        self._notifications.remove(notification)
+        self._layout.removeWidget(notification)
+        notification.deleteLater()
+        if self._notifications:
+            self._reposition()
+        else:
+            self.hide()
+    
+    def _reposition(self):
+        self.adjustSize()
+        parent = self.parentWidget()
+        self.move(parent.width() - self.width() - self.MARGIN, self.MARGIN)
@@ -0,0 +1,104 @@
+import time
+
+from PySide6.QtCore import QObject, QEvent, QTimer, Qt, Signal
+from PySide6.QtGui import QKeyEvent
+from PySide6.QtWidgets import QApplication, QWidget
+
+class KeyboardWedgeFilter(QObject):
+    """
+    キーボードとして動作するUSBスキャナー（HID）の入力を検出するアプリケーション全体のイベントフィルター
+    
+    スキャナーは1文字あたり数ミリ秒の間隔でキーを送り、最後に Enter を送る。文字キーは
+    いったん保留し、次のキーが max_interval ミリ秒以内に続いて Enter で終わり、min_length 文字
+    以上あればバーコードとして barcode_scanned を通知する（キー入力はウィジェットに渡さない）。
+    間隔が空いた場合は人の入力とみなし、保留したキーをフォーカスのあるウィジェットに送り直す。
+    フォーカスがどこにあっても読み取れるが、人の入力は最大 max_interval ミリ秒遅れて表示される。
+    """
+    barcode_scanned = Signal(str)
+    
+    DEFAULT_MAX_INTERVAL_MS = 30
+    DEFAULT_MIN_LENGTH = 4
+    FLUSH_MARGIN_MS = 10
+    TERMINATOR_KEYS = (Qt.Key_Return, Qt.Key_Enter)
+    
+    def __init__(self, max_interval_ms: int = DEFAULT_MAX_INTERVAL_MS,
+                 min_length: int = DEFAULT_MIN_LENGTH, parent=None):
+        super().__init__(parent)
+        self.max_interval_ms = max_interval_ms
+        self.min_length = min_length
+        self.enabled = False
+        self._pending = []          # (キー, 修飾キー, 文字)
+        self._last_timestamp = 0
+        self._replaying = False
+        self._flush_timer = QTimer(self)
+        self._flush_timer.setSingleShot(True)
+        self._flush_timer.setTimerType(Qt.PreciseTimer)
+        self._flush_timer.timeout.connect(self.flush)
+        
+        # 計測用
+        self.scan_count = 0
+        self.replayed_keys = 0
+    
+    def install(self):
+        QApplication.instance().installEventFilter(self)
+    
+    def uninstall(self):
+        self.flush()
+        QApplication.instance().removeEventFilter(self)
+    
+    def set_enabled(self, enabled: bool):
+        if not enabled:
+            self.flush()
+        self.enabled = enabled
+    
+    def eventFilter(self, obj, event):
+        # ウィンドウ（QWindow）経由の配送と、送り直したキーは対象外
+        if (not self.enabled or self._replaying or event.type() != QEvent.KeyPress
+                or not isinstance(obj, QWidget)):
+            return False
+        
+        timestamp = event.timestamp() or int(time.monotonic() * 1000)
+        interval = timestamp - self._last_timestamp
+        if self._pending and interval > self.max_interval_ms:
+            self.flush()
+        
+        key = event.key()
+        if key in self.TERMINATOR_KEYS:
+            if len(self._pending) >= self.min_length:
+                barcode = ''.join(text for _, _, text in self._pending).strip()
+                self._pending.clear()
+                self._flush_timer.stop()
+                if barcode:
+                    self.scan_count += 1
+                    self.barcode_scanned.emit(barcode)
+                    return True
+            self.flush()
+            return False
+        
+        text = event.text()
+        modifiers = event.modifiers() & ~(Qt.ShiftModifier | Qt.KeypadModifier)
+        if not text or not text.isprintable() or modifiers:
+            self.flush()
+            return False
+        
+        self._pending.append((key, event.modifiers(), text))
+        self._last_timestamp = timestamp
+        # 次のキーのイベントより先にタイマーが発火しないよう少し余裕を持たせる
+        self._flush_timer.start(self.max_interval_ms + self.FLUSH_MARGIN_MS)
+        return True
+    
+    def flush(self):
+        """保留中のキーを人の入力としてフォーカスのあるウィジェットに送り直す"""
+        self._flush_timer.stop()
+        pending, self._pending = self._pending, []
+        widget = QApplication.focusWidget()
+        if not pending or widget is None:
+            return
+        self._replaying = True
+        try:
+            for key, modifiers, text in pending:
+                QApplication.sendEvent(widget, QKeyEvent(QEvent.KeyPress, key, modifiers, text))
+                QApplication.sendEvent(widget, QKeyEvent(QEvent.KeyRelease, key, modifiers, text))
+                self.replayed_keys += 1
+        finally:
+            self._replaying = False
@@ -1,27 +1,74 @@
 from PySide6.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
                                 QPushButton, QLabel, QLineEdit, QGroupBox,
-                                QMessageBox, QTextEdit, QComboBox, QRadioButton,
-                                QButtonGroup, QFrame)
+                                QMessageBox, QPlainTextEdit, QRadioButton,
+                                QButtonGroup, QFrame, QListWidget, QListWidgetItem,
+                                QTableWidget, QTableWidgetItem, QHeaderView, QSpinBox,
+                                QProgressDialog)
 from PySide6.QtCore import Qt, QTimer
 from PySide6.QtGui import QFont
 
 from core.database import VisitorDatabase
+from core.db_service import DatabaseService
 from core.barcode_reader import ScannerReaderThread
-from gui.check_in_dialog import CheckInDialog
-from gui.statistics_window import StatisticsWindow
+from core.scanner_manager import ScannerManager
+from core.scan_filter import ScanDeduplicator
+from core.event_log import EventLog
+from gui.check_in_dialog import CheckInNotificationArea
+from gui.statistics_window import StatisticsWindow, ExportThread
+from gui.search_dialog import VisitorSearchDialog
+from gui.keyboard_wedge import KeyboardWedgeFilter
+from gui.scanner_display import ScannerDisplay
 
 class MainWindow(QMainWindow):
+    LOG_MAX_LINES = 1000
+    
     def __init__(self):
         super().__init__()
         self.setWindowTitle("来場管理システム")
         self.setGeometry(100, 100, 1200, 700)
         
+        # 来場ログはファイルにも残す（書き込みは別スレッド）。画面を作る間のログも残るよう先に開始する
+        self.event_log = EventLog()
+        try:
+            self.event_log.start()
+            event_log_error = None
+        except OSError as e:
+            event_log_error = e
+        
         self.db = VisitorDatabase()
-        self.scanner_reader = None
+        # データベース処理はすべてサービス経由でワーカースレッドに渡し、結果をシグナルで受け取る
+        self.db_service = DatabaseService(self.db, self)
+        self.db_service.scan_resolved.connect(self.on_scan_resolved)
+        self.db_service.check_in_finished.connect(self.on_check_in_finished)
+        self.db_service.stats_ready.connect(self.on_stats_ready)
+        self.db_service.stats_changed.connect(self.on_stats_ready)
+        self.db_service.request_failed.connect(self.on_db_request_failed)
+        self.db_service.busy_changed.connect(self.on_db_busy_changed)
+        # 選択したすべてのポートのスキャナーを1本の読み取りの流れにまとめる
+        self.scanner_manager = ScannerManager(parent=self)
+        self.scanner_manager.barcode_detected.connect(self.on_barcode_detected)
+        self.scanner_manager.port_error.connect(self.on_scanner_error)
+        self.scanner_manager.port_status_changed.connect(self.update_port_table)
+        self.scanner_manager.port_reconnected.connect(self.on_scanner_reconnected)
+        # スキャナーモードの間はポートの抜き差しを監視し、一覧を更新する
+        self.scanner_manager.watcher.ports_changed.connect(self.refresh_ports)
+        # バッジをかざしたままの連続読み取りはデータベースに渡す前に捨てる
+        self.scan_deduplicator = ScanDeduplicator()
+        # キーボード型スキャナー: どのウィジェットにフォーカスがあっても連続入力を読み取る
+        self.keyboard_wedge = KeyboardWedgeFilter(parent=self)
+        self.keyboard_wedge.barcode_scanned.connect(self.on_keyboard_barcode_scanned)
+        self.keyboard_wedge.install()
         self.scanner_active = False
         self.current_mode = 'manual'
+        # 統計ウィンドウはモードレスで1つだけ開く。エクスポートはウィンドウを閉じても続くようここで実行する
+        self.statistics_window = None
+        self.export_thread = None
+        self.export_progress = None
         
         self.init_ui()
+        
+        if event_log_error is not None:
+            self.add_log(f"⚠️ ログファイルを開けません: {event_log_error}")
     
     def init_ui(self):
         central_widget = QWidget()
@@ -56,6 +103,11 @@ class MainWindow(QMainWindow):
         self.mode_button_group.addButton(self.radio_scanner)
         mode_layout.addWidget(self.radio_scanner)
         
+        self.radio_keyboard = QRadioButton("キーボード型スキャナー")
+        self.radio_keyboard.toggled.connect(lambda: self.switch_mode('keyboard'))
+        self.mode_button_group.addButton(self.radio_keyboard)
+        mode_layout.addWidget(self.radio_keyboard)
+        
         mode_layout.addStretch()
         
         hint_label = QLabel("💡 推奨: USBバーコードスキャナーを使用すると高速で確実です")
@@ -103,65 +155,29 @@ class MainWindow(QMainWindow):
         """)
         stats_layout.addWidget(btn_statistics)
         
-        stats_group.setLayout(stats_layout)
-        main_layout.addWidget(stats_group)
-        
-        # スキャナー用大画面表示エリア
-        self.scanner_display_group = QGroupBox("読み取り表示")
-        scanner_display_layout = QVBoxLayout()
-        scanner_display_layout.setSpacing(8)
-        
-        # 読み取ったバーコード表示
-        self.lbl_scanned_barcode = QLabel("バーコードをスキャンしてください")
-        self.lbl_scanned_barcode.setAlignment(Qt.AlignCenter)
-        self.lbl_scanned_barcode.setStyleSheet("""
-            QLabel {
-                background-color: #f5f5f5;
-                border: 3px solid #2196F3;
-                border-radius: 10px;
-                padding: 25px;
-                font-size: 48px;
-                font-weight: bold;
-                color: #2196F3;
-                min-height: 100px;
-                max-height: 120px;
-            }
-        """)
-        scanner_display_layout.addWidget(self.lbl_scanned_barcode)
-        
-        # 読み取った氏名表示
-        self.lbl_scanned_name = QLabel("")
-        self.lbl_scanned_name.setAlignment(Qt.AlignCenter)
-        self.lbl_scanned_name.setStyleSheet("""
-            QLabel {
-                font-size: 64px;
-                font-weight: bold;
-                color: #333;
-                padding: 15px;
-                min-height: 90px;
-                max-height: 110px;
+        btn_search = QPushButton("🔍 来場者検索")
+        btn_search.clicked.connect(self.show_search)
+        btn_search.setStyleSheet("""
+            QPushButton {
+                background-color: #607D8B;
+                color: white;
+                font-size: 14px;
+                padding: 8px 16px;
+                border-radius: 5px;
             }
-        """)
-        scanner_display_layout.addWidget(self.lbl_scanned_name)
-        
-        # ステータス表示
-        self.lbl_scanned_status = QLabel("")
-        self.lbl_scanned_status.setAlignment(Qt.AlignCenter)
-        self.lbl_scanned_status.setStyleSheet("""
-            QLabel {
-                font-size: 36px;
-                font-weight: bold;
-                padding: 12px;
-                border-radius: 8px;
-                min-height: 60px;
-                max-height: 80px;
+            QPushButton:hover {
+                background-color: #455A64;
             }
         """)
-        scanner_display_layout.addWidget(self.lbl_scanned_status)
+        stats_layout.addWidget(btn_search)
         
-        self.scanner_display_group.setLayout(scanner_display_layout)
-        self.scanner_display_group.setVisible(False)
-        main_layout.addWidget(self.scanner_display_group)
+        stats_group.setLayout(stats_layout)
+        main_layout.addWidget(stats_group)
+        
+        # スキャナー用大画面表示エリア
+        self.scanner_display = ScannerDisplay("読み取り表示")
+        self.scanner_display.setVisible(False)
+        main_layout.addWidget(self.scanner_display)
         
         # スキャナー設定
         self.scanner_group = QGroupBox("USBスキャナー設定")
@@ -169,14 +185,16 @@ class MainWindow(QMainWindow):
         scanner_layout.setSpacing(8)
         
         port_layout = QHBoxLayout()
-        port_layout.addWidget(QLabel("ポート:"))
-        self.combo_port = QComboBox()
-        self.combo_port.setMinimumWidth(400)
-        port_layout.addWidget(self.combo_port)
+        port_layout.addWidget(QLabel("ポート:"), alignment=Qt.AlignTop)
+        # 複数のスキャナーを同時に使う場合は複数のポートにチェックを入れる
+        self.list_ports = QListWidget()
+        self.list_ports.setMinimumWidth(400)
+        self.list_ports.setMaximumHeight(80)
+        port_layout.addWidget(self.list_ports)
         
         btn_refresh_ports = QPushButton("🔄 ポート更新")
         btn_refresh_ports.clicked.connect(self.refresh_ports)
-        port_layout.addWidget(btn_refresh_ports)
+        port_layout.addWidget(btn_refresh_ports, alignment=Qt.AlignTop)
         port_layout.addStretch()
         scanner_layout.addLayout(port_layout)
         
@@ -196,6 +214,20 @@ class MainWindow(QMainWindow):
             }
         """)
         scanner_control_layout.addWidget(self.btn_start_scanner)
+        
+        scanner_control_layout.addSpacing(20)
+        scanner_control_layout.addWidget(QLabel("同じコードの再読み取りを無視:"))
+        self.spin_dedup_window = QSpinBox()
+        self.spin_dedup_window.setRange(0, 300)
+        self.spin_dedup_window.setValue(int(self.scan_deduplicator.window))
+        self.spin_dedup_window.setSuffix(" 秒")
+        self.spin_dedup_window.setSpecialValueText("無効")
+        self.spin_dedup_window.valueChanged.connect(self.on_dedup_window_changed)
+        scanner_control_layout.addWidget(self.spin_dedup_window)
+        
+        self.lbl_dedup_count = QLabel("無視: 0件")
+        self.lbl_dedup_count.setStyleSheet("QLabel { color: #757575; }")
+        scanner_control_layout.addWidget(self.lbl_dedup_count)
         scanner_control_layout.addStretch()
         scanner_layout.addLayout(scanner_control_layout)
         
@@ -203,7 +235,19 @@ class MainWindow(QMainWindow):
         self.lbl_scanner_status.setStyleSheet("QLabel { font-weight: bold; font-size: 14px; }")
         scanner_layout.addWidget(self.lbl_scanner_status)
         
-        scanner_hint = QLabel("ℹ️ USBバーコードスキャナーを接続してポートを更新してください")
+        # ポートごとの状態と読み取り件数
+        self.port_table = QTableWidget(0, 7)
+        self.port_table.setHorizontalHeaderLabels(["ポート", "状態", "読み取り", "件/分", "エラー", "再接続", "欠落"])
+        self.port_table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        self.port_table.verticalHeader().setVisible(False)
+        self.port_table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.port_table.setMaximumHeight(110)
+        scanner_layout.addWidget(self.port_table)
+        
+        self.port_stats_timer = QTimer(self)
+        self.port_stats_timer.timeout.connect(self.update_port_table)
+        
+        scanner_hint = QLabel("ℹ️ USBバーコードスキャナーを接続してポートを選択してください（抜き差しは自動で検出・再接続します）")
         scanner_hint.setStyleSheet("QLabel { color: #757575; font-size: 11px; }")
         scanner_layout.addWidget(scanner_hint)
         
@@ -248,9 +292,22 @@ class MainWindow(QMainWindow):
         
         manual_layout.addLayout(input_row)
         
+        manual_option_row = QHBoxLayout()
         manual_hint = QLabel("ℹ️ 既存の来場者はバーコードのみで自動認識されます")
         manual_hint.setStyleSheet("QLabel { color: #757575; font-size: 11px; }")
-        manual_layout.addWidget(manual_hint)
+        manual_option_row.addWidget(manual_hint)
+        manual_option_row.addStretch()
+        
+        manual_option_row.addWidget(QLabel("結果の表示時間:"))
+        self.spin_notification_timeout = QSpinBox()
+        self.spin_notification_timeout.setRange(1, 30)
+        self.spin_notification_timeout.setValue(CheckInNotificationArea.DEFAULT_TIMEOUT_MS // 1000)
+        self.spin_notification_timeout.setSuffix(" 秒")
+        self.spin_notification_timeout.valueChanged.connect(
+            lambda seconds: self.notification_area.set_timeout(seconds * 1000)
+        )
+        manual_option_row.addWidget(self.spin_notification_timeout)
+        manual_layout.addLayout(manual_option_row)
         
         self.manual_group.setLayout(manual_layout)
         main_layout.addWidget(self.manual_group)
@@ -260,22 +317,24 @@ class MainWindow(QMainWindow):
         log_layout = QVBoxLayout()
         log_layout.setContentsMargins(5, 5, 5, 5)
         
-        self.log_text = QTextEdit()
+        # 画面には直近 LOG_MAX_LINES 行だけ残す（全件は EventLog のファイルに残る）
+        self.log_text = QPlainTextEdit()
         self.log_text.setReadOnly(True)
+        self.log_text.setMaximumBlockCount(self.LOG_MAX_LINES)
         self.log_text.setMaximumHeight(120)
-        self.log_text.setStyleSheet("QTextEdit { font-family: monospace; font-size: 12px; }")
+        self.log_text.setStyleSheet("QPlainTextEdit { font-family: monospace; font-size: 12px; }")
         log_layout.addWidget(self.log_text)
         
         log_group.setLayout(log_layout)
         main_layout.addWidget(log_group)
         
+        # チェックイン結果は入力を止めないよう画面右上に重ねて表示する
+        self.notification_area = CheckInNotificationArea(central_widget)
+        
         # 初期化
         self.refresh_ports()
         
-        self.stats_timer = QTimer()
-        self.stats_timer.timeout.connect(self.update_stats)
-        self.stats_timer.start(5000)
-        
+        # 以降の統計はチェックインや他端末の書き込みに応じて stats_changed で届く
         self.update_stats()
         self.add_log("システムを起動しました")
         self.barcode_input.setFocus()
@@ -285,31 +344,48 @@ class MainWindow(QMainWindow):
             self.stop_scanner()
         
         self.current_mode = mode
+        if mode == 'scanner':
+            self.scanner_manager.watcher.start()
+        else:
+            self.scanner_manager.watcher.stop()
+        self.keyboard_wedge.set_enabled(mode == 'keyboard')
         self.scanner_group.setVisible(mode == 'scanner')
-        self.scanner_display_group.setVisible(mode == 'scanner')
+        self.scanner_display.setVisible(mode in ('scanner', 'keyboard'))
         self.manual_group.setVisible(mode == 'manual')
         
-        mode_names = {'manual': '手動入力', 'scanner': 'USBスキャナー'}
+        mode_names = {'manual': '手動入力', 'scanner': 'USBスキャナー', 'keyboard': 'キーボード型スキャナー'}
         self.add_log(f"モード切り替え: {mode_names.get(mode, mode)}")
         
         if mode == 'manual':
             self.barcode_input.setFocus()
-        elif mode == 'scanner':
-            self.lbl_scanned_barcode.setText("バーコードをスキャンしてください")
-            self.lbl_scanned_name.setText("")
-            self.lbl_scanned_status.setText("")
+        elif mode in ('scanner', 'keyboard'):
+            self.scanner_display.reset()
     
     def refresh_ports(self):
-        self.combo_port.clear()
-        ports = ScannerReaderThread.list_available_ports()
+        checked = set(self.selected_ports())
+        self.list_ports.clear()
+        watcher = self.scanner_manager.watcher
+        if watcher.has_devices():
+            # 監視中はワーカースレッドで取得済みの一覧を使い、GUIスレッドでは列挙しない
+            ports = [(device['device'], device['description']) for device in watcher.devices.values()]
+        else:
+            ports = ScannerReaderThread.list_available_ports()
         
         if ports:
-            for port, description in ports:
-                self.combo_port.addItem(f"{port} - {description}", port)
+            for index, (port, description) in enumerate(ports):
+                item = QListWidgetItem(f"{port} - {description}")
+                item.setData(Qt.UserRole, port)
+                item.setFlags(item.flags() | Qt.ItemIsUserCheckable)
+                # 前回選択していたポート（初回は先頭のポート）にチェックを入れる
+                selected = port in checked if checked else index == 0
+                item.setCheckState(Qt.Checked if selected else Qt.Unchecked)
+                self.list_ports.addItem(item)
             if hasattr(self, 'log_text'):
                 self.add_log(f"シリアルポート: {len(ports)}個検出")
         else:
-            self.combo_port.addItem("利用可能なポートがありません", None)
+            item = QListWidgetItem("利用可能なポートがありません")
+            item.setFlags(Qt.NoItemFlags)
+            self.list_ports.addItem(item)
             if hasattr(self, 'log_text'):
                 self.add_log("シリアルポートが見つかりません")
     
@@ -319,16 +395,24 @@ class MainWindow(QMainWindow):
         else:
             self.stop_scanner()
     
+    def selected_ports(self):
+        """チェックされているポート"""
+        ports = []
+        for row in range(self.list_ports.count()):
+            item = self.list_ports.item(row)
+            if item.checkState() == Qt.Checked and item.data(Qt.UserRole):
+                ports.append(item.data(Qt.UserRole))
+        return ports
+    
     def start_scanner(self):
-        selected_port = self.combo_port.currentData()
-        if not selected_port:
+        selected_ports = self.selected_ports()
+        if not selected_ports:
             QMessageBox.warning(self, "エラー", "有効なポートを選択してください")
             return
         
-        self.scanner_reader = ScannerReaderThread(port=selected_port)
-        self.scanner_reader.barcode_detected.connect(self.on_barcode_detected)
-        self.scanner_reader.error_occurred.connect(self.on_scanner_error)
-        self.scanner_reader.start()
+        self.scanner_manager.start(selected_ports)
+        self.port_stats_timer.start(1000)
+        self.update_port_table()
         
         self.scanner_active = True
         self.btn_start_scanner.setText("⏹ スキャナー停止")
@@ -344,31 +428,17 @@ class MainWindow(QMainWindow):
                 background-color: #da190b;
             }
         """)
-        self.lbl_scanner_status.setText(f"スキャナー: 起動中 ({selected_port})")
+        port_names = ", ".join(selected_ports)
+        self.lbl_scanner_status.setText(f"スキャナー: 起動中 ({port_names})")
         self.lbl_scanner_status.setStyleSheet("QLabel { font-weight: bold; font-size: 14px; color: #4CAF50; }")
-        self.add_log(f"スキャナーを起動: {selected_port}")
-        
-        self.lbl_scanned_barcode.setText("バーコードをスキャンしてください")
-        self.lbl_scanned_barcode.setStyleSheet("""
-            QLabel {
-                background-color: #f5f5f5;
-                border: 3px solid #2196F3;
-                border-radius: 10px;
-                padding: 25px;
-                font-size: 48px;
-                font-weight: bold;
-                color: #2196F3;
-                min-height: 100px;
-                max-height: 120px;
-            }
-        """)
-        self.lbl_scanned_name.setText("")
-        self.lbl_scanned_status.setText("")
+        self.add_log(f"スキャナーを起動: {port_names}")
+        
+        self.scanner_display.reset()
     
     def stop_scanner(self):
-        if self.scanner_reader:
-            self.scanner_reader.stop()
-            self.scanner_reader = None
+        self.scanner_manager.stop()
+        self.port_stats_timer.stop()
+        self.update_port_table()
         
         self.scanner_active = False
         self.btn_start_scanner.setText("スキャナー起動")
@@ -388,157 +458,108 @@ class MainWindow(QMainWindow):
         self.lbl_scanner_status.setStyleSheet("QLabel { font-weight: bold; font-size: 14px; }")
         self.add_log("スキャナーを停止しました")
     
-    def on_scanner_error(self, error_message: str):
-        self.add_log(f"❌ スキャナーエラー: {error_message}")
-        QMessageBox.warning(self, "スキャナーエラー", error_message)
-        if self.scanner_active:
-            self.stop_scanner()
+    def on_scanner_error(self, port: str, error_message: str):
+        # 受付を止めないようダイアログは出さず、再接続は ScannerManager に任せる
+        self.add_log(f"❌ スキャナーエラー ({port}): {error_message} - 再接続を待機します")
+        self.update_port_table()
     
-    def on_barcode_detected(self, barcode: str):
-        self.lbl_scanned_barcode.setText(f"ID: {barcode}")
-        self.lbl_scanned_barcode.setStyleSheet("""
-            QLabel {
-                background-color: #E3F2FD;
-                border: 3px solid #2196F3;
-                border-radius: 10px;
-                padding: 25px;
-                font-size: 48px;
-                font-weight: bold;
-                color: #1976D2;
-                min-height: 100px;
-                max-height: 120px;
-            }
-        """)
+    def on_scanner_reconnected(self, port: str, device: str, seconds: float):
+        device_text = f" → {device}" if device != port else ""
+        self.add_log(f"🔌 スキャナー再接続 ({port}{device_text}): {seconds:.1f}秒")
+        self.update_port_table()
+    
+    def update_port_table(self, *args):
+        port_stats = self.scanner_manager.get_port_statistics()
+        self.port_table.setRowCount(len(port_stats))
+        for row, stats in enumerate(port_stats):
+            port_text = stats['port']
+            if stats['device'] != stats['port']:
+                port_text += f" → {stats['device']}"
+            values = [
+                port_text,
+                stats['status_name'],
+                str(stats['scan_count']),
+                f"{stats['scans_per_minute']:.1f}",
+                str(stats['error_count']),
+                str(stats['reconnect_count']),
+                str(stats['dropped_scans']),
+            ]
+            for column, value in enumerate(values):
+                item = QTableWidgetItem(value)
+                tooltip = stats['last_error']
+                if stats['last_reconnect_seconds'] is not None:
+                    tooltip += f"\n前回の再接続: {stats['last_reconnect_seconds']:.1f}秒"
+                if tooltip:
+                    item.setToolTip(tooltip.strip())
+                self.port_table.setItem(row, column, item)
+    
+    def on_dedup_window_changed(self, seconds: int):
+        self.scan_deduplicator.set_window(seconds)
+        if seconds:
+            self.add_log(f"同じコードの再読み取りを{seconds}秒間無視します")
+        else:
+            self.add_log("再読み取りの無視を無効にしました")
+    
+    def on_keyboard_barcode_scanned(self, barcode: str):
+        # シリアルのスキャナーと同じ経路（重複の無視 → 氏名の解決 → チェックイン）で処理する
+        self.on_barcode_detected(barcode, 'キーボード')
+    
+    def on_barcode_detected(self, barcode: str, port: str):
+        if not self.scan_deduplicator.accept(barcode):
+            suppressed = self.scan_deduplicator.suppressed_count
+            self.lbl_dedup_count.setText(f"無視: {suppressed}件")
+            self.add_log(f"⏭ 重複読み取りを無視: {barcode} [{port}]")
+            return
         
-        visitor_info = self.db.get_visitor_info(barcode)
+        self.scanner_display.show_scanned(barcode)
         
-        if visitor_info:
-            name = visitor_info['name']
-            self.process_check_in_with_display(barcode, name)
-        else:
-            self.lbl_scanned_name.setText("新規来場者")
-            self.lbl_scanned_name.setStyleSheet("""
-                QLabel {
-                    font-size: 64px;
-                    font-weight: bold;
-                    color: #FF9800;
-                    padding: 15px;
-                    min-height: 90px;
-                    max-height: 110px;
-                }
-            """)
-            self.lbl_scanned_status.setText("⚠️ スタッフに氏名を伝えてください")
-            self.lbl_scanned_status.setStyleSheet("""
-                QLabel {
-                    background-color: #FFF3E0;
-                    font-size: 36px;
-                    font-weight: bold;
-                    color: #F57C00;
-                    padding: 12px;
-                    border-radius: 8px;
-                    min-height: 60px;
-                    max-height: 80px;
-                }
-            """)
-            
-            self.add_log(f"⚠️ 新規来場者 ({barcode}) - 名前を入力してください")
-            QTimer.singleShot(3000, self.clear_scanner_display)
-            
-            self.radio_manual.setChecked(True)
-            self.barcode_input.setText(barcode)
+        # 読み取ったポートを source に付けてログに残す
+        self.db_service.submit_scan(barcode, f'scanner:{port}')
+    
+    def on_scan_resolved(self, barcode: str, name: str, source: str):
+        if name:
+            # 登録済み（または氏名入力済み）: チェックイン結果は on_check_in_finished で表示
+            return
+        
+        if source == 'manual':
+            # 送信時に消した入力を戻して氏名を入力してもらう
+            self.restore_manual_input(barcode, "")
+            QMessageBox.warning(self, "入力エラー", f"新規来場者 ({barcode}) の場合、氏名を入力してください")
             self.name_input.setFocus()
+            return
+        
+        self.scanner_display.show_new_visitor(barcode)
+        self.add_log(f"⚠️ 新規来場者 ({barcode}) - 名前を入力してください")
+        
+        self.radio_manual.setChecked(True)
+        self.barcode_input.setText(barcode)
+        self.name_input.setFocus()
     
-    def process_check_in_with_display(self, barcode: str, name: str):
-        try:
-            is_first_visit, visit_count, last_visit = self.db.check_in(barcode, name)
-            
-            self.lbl_scanned_name.setText(name)
-            self.lbl_scanned_name.setStyleSheet("""
-                QLabel {
-                    font-size: 72px;
-                    font-weight: bold;
-                    color: #333;
-                    padding: 15px;
-                    min-height: 90px;
-                    max-height: 110px;
-                }
-            """)
-            
-            if is_first_visit:
-                status_text = "🎉 初回来場 - ようこそ！"
-                status_style = """
-                    QLabel {
-                        background-color: #C8E6C9;
-                        font-size: 42px;
-                        font-weight: bold;
-                        color: #2E7D32;
-                        padding: 12px;
-                        border-radius: 8px;
-                        min-height: 60px;
-                        max-height: 80px;
-                    }
-                """
+    def on_check_in_finished(self, barcode: str, name: str, source: str, result, error):
+        if source.startswith('scanner'):
+            if error:
+                self.show_scanner_check_in_error(error)
             else:
-                status_text = f"🔄 {visit_count}回目の来場 - お帰りなさい！"
-                status_style = """
-                    QLabel {
-                        background-color: #BBDEFB;
-                        font-size: 42px;
-                        font-weight: bold;
-                        color: #1565C0;
-                        padding: 12px;
-                        border-radius: 8px;
-                        min-height: 60px;
-                        max-height: 80px;
-                    }
-                """
-            
-            self.lbl_scanned_status.setText(status_text)
-            self.lbl_scanned_status.setStyleSheet(status_style)
-            
-            status = "初回来場" if is_first_visit else f"{visit_count}回目の来場"
-            status_icon = "🎉" if is_first_visit else "🔄"
-            self.add_log(f"{status_icon} {name} ({barcode}) - {status}")
-            
-            self.update_stats()
-            QTimer.singleShot(5000, self.clear_scanner_display)
-            
-        except Exception as e:
-            self.lbl_scanned_name.setText("エラー")
-            self.lbl_scanned_status.setText(f"❌ {str(e)}")
-            self.lbl_scanned_status.setStyleSheet("""
-                QLabel {
-                    background-color: #FFCDD2;
-                    font-size: 36px;
-                    font-weight: bold;
-                    color: #C62828;
-                    padding: 12px;
-                    border-radius: 8px;
-                    min-height: 60px;
-                    max-height: 80px;
-                }
-            """)
-            self.add_log(f"❌ エラー: {str(e)}")
-            QTimer.singleShot(3000, self.clear_scanner_display)
-    
-    def clear_scanner_display(self):
-        if self.current_mode == 'scanner':
-            self.lbl_scanned_barcode.setText("バーコードをスキャンしてください")
-            self.lbl_scanned_barcode.setStyleSheet("""
-                QLabel {
-                    background-color: #f5f5f5;
-                    border: 3px solid #2196F3;
-                    border-radius: 10px;
-                    padding: 25px;
-                    font-size: 48px;
-                    font-weight: bold;
-                    color: #2196F3;
-                    min-height: 100px;
-                    max-height: 120px;
-                }
-            """)
-            self.lbl_scanned_name.setText("")
-            self.lbl_scanned_status.setText("")
+                self.show_scanner_check_in_result(barcode, name, source, *result)
+        else:
+            if error:
+                self.show_manual_check_in_error(barcode, name, error)
+            else:
+                self.show_manual_check_in_result(barcode, name, *result)
+    
+    def show_scanner_check_in_result(self, barcode: str, name: str, source: str,
+                                     is_first_visit: bool, visit_count: int, last_visit: str):
+        self.scanner_display.show_check_in(barcode, name, is_first_visit, visit_count)
+        
+        status = "初回来場" if is_first_visit else f"{visit_count}回目の来場"
+        status_icon = "🎉" if is_first_visit else "🔄"
+        port = source.partition(':')[2]
+        port_suffix = f" [{port}]" if port else ""
+        self.add_log(f"{status_icon} {name} ({barcode}) - {status}{port_suffix}")
+    
+    def show_scanner_check_in_error(self, error: Exception):
+        self.scanner_display.show_error(str(error))
+        self.add_log(f"❌ エラー: {str(error)}")
     
     def manual_check_in(self):
         barcode = self.barcode_input.text().strip()
@@ -549,54 +570,156 @@ class MainWindow(QMainWindow):
             self.barcode_input.setFocus()
             return
         
-        visitor_info = self.db.get_visitor_info(barcode)
-        if visitor_info:
-            name = visitor_info['name']
-        elif not name:
-            QMessageBox.warning(self, "入力エラー", "新規来場者の場合、氏名を入力してください")
-            self.name_input.setFocus()
-            return
-        
-        self.process_check_in(barcode, name)
+        # 結果を待たずに入力欄を空にし、次の来場者を続けて入力できるようにする
+        # （Enter の連打で同じ来場者を二重にチェックインしないためでもある）
         self.barcode_input.clear()
         self.name_input.clear()
         self.barcode_input.setFocus()
+        
+        # 登録済みなら登録名で、未登録なら入力された氏名でチェックイン（結果は on_scan_resolved）
+        self.db_service.submit_scan(barcode, 'manual', name)
     
-    def process_check_in(self, barcode: str, name: str):
-        try:
-            is_first_visit, visit_count, last_visit = self.db.check_in(barcode, name)
-            
-            dialog = CheckInDialog(name, is_first_visit, visit_count, self)
-            dialog.exec()
-            
-            status = "初回来場" if is_first_visit else f"{visit_count}回目の来場"
-            status_icon = "🎉" if is_first_visit else "🔄"
-            self.add_log(f"{status_icon} {name} ({barcode}) - {status}")
-            
-            self.update_stats()
-            
-        except Exception as e:
-            QMessageBox.critical(self, "エラー", f"チェックイン処理中にエラーが発生しました:\n{str(e)}")
-            self.add_log(f"❌ エラー: {str(e)}")
+    def restore_manual_input(self, barcode: str, name: str):
+        """チェックインできなかった入力を手動入力欄に戻す（次の入力が始まっていれば戻さない）"""
+        if self.barcode_input.text() or self.name_input.text():
+            return
+        self.barcode_input.setText(barcode)
+        self.name_input.setText(name)
+    
+    def show_manual_check_in_result(self, barcode: str, name: str,
+                                    is_first_visit: bool, visit_count: int, last_visit: str):
+        self.notification_area.show_check_in(name, is_first_visit, visit_count)
+        
+        status = "初回来場" if is_first_visit else f"{visit_count}回目の来場"
+        status_icon = "🎉" if is_first_visit else "🔄"
+        self.add_log(f"{status_icon} {name} ({barcode}) - {status}")
+    
+    def show_manual_check_in_error(self, barcode: str, name: str, error: Exception):
+        self.restore_manual_input(barcode, name)
+        self.notification_area.show_error(f"チェックイン処理中にエラーが発生しました: {str(error)}")
+        self.add_log(f"❌ エラー: {str(error)}")
     
     def update_stats(self):
-        stats = self.db.get_statistics()
+        self.db_service.refresh_stats()
+    
+    def on_stats_ready(self, stats: dict):
         self.lbl_today_total.setText(f"本日: {stats['today_visitors']}人")
         self.lbl_today_first.setText(f"初回: {stats['today_first_visitors']}人")
         self.lbl_today_returning.setText(f"再来場: {stats['today_returning_visitors']}人")
     
+    def on_db_request_failed(self, operation: str, message: str):
+        self.add_log(f"❌ データベースエラー ({operation}): {message}")
+    
+    def on_db_busy_changed(self, busy: bool):
+        if busy:
+            self.statusBar().showMessage("⏳ 処理中...")
+            if self.current_mode in ('scanner', 'keyboard'):
+                self.scanner_display.set_busy(True)
+        else:
+            self.statusBar().clearMessage()
+            self.scanner_display.set_busy(False)
+    
     def show_statistics(self):
-        dialog = StatisticsWindow(self.db, self)
+        # チェックインを続けられるようモードレスで表示する
+        if self.statistics_window is None:
+            self.statistics_window = StatisticsWindow(self.db, self.db_service, self)
+            self.statistics_window.export_requested.connect(self.start_export)
+            self.statistics_window.finished.connect(self.on_statistics_closed)
+        self.statistics_window.show()
+        self.statistics_window.raise_()
+        self.statistics_window.activateWindow()
+    
+    def on_statistics_closed(self, result: int):
+        self.statistics_window.deleteLater()
+        self.statistics_window = None
+    
+    def start_export(self, file_path: str):
+        """Excelエクスポートをバックグラウンドで実行（中断は進捗ダイアログのキャンセルだけ）"""
+        if self.export_thread is not None:
+            QMessageBox.information(self, "Excelエクスポート", "エクスポートの実行中です。終わってからもう一度実行してください")
+            return
+        
+        # モードレスにして、エクスポート中も手動入力やスキャンを受け付ける
+        self.export_progress = QProgressDialog("エクスポート中...", "キャンセル", 0, 100, self)
+        self.export_progress.setWindowTitle("Excelエクスポート")
+        self.export_progress.setWindowModality(Qt.NonModal)
+        self.export_progress.setMinimumDuration(0)
+        self.export_progress.setAutoClose(False)
+        self.export_progress.setAutoReset(False)
+        self.export_progress.setValue(0)
+        
+        self.export_thread = ExportThread(self.db, file_path, self)
+        self.export_thread.progress.connect(self.on_export_progress)
+        self.export_thread.succeeded.connect(self.on_export_succeeded)
+        self.export_thread.failed.connect(self.on_export_failed)
+        self.export_thread.cancelled.connect(self.on_export_cancelled)
+        self.export_thread.finished.connect(self.on_export_finished)
+        self.export_progress.canceled.connect(self.export_thread.cancel)
+        
+        self.export_thread.start()
+        self.add_log(f"📤 Excelエクスポートを開始: {file_path}")
+    
+    def on_export_progress(self, done: int, total: int):
+        if self.export_progress and total > 0:
+            self.export_progress.setLabelText(f"エクスポート中... {done:,} / {total:,} 行")
+            self.export_progress.setValue(int(done * 100 / total))
+    
+    def on_export_succeeded(self, file_path: str):
+        self.close_export_progress()
+        self.add_log(f"📤 Excelエクスポートが完了: {file_path}")
+        QMessageBox.information(self, "成功", f"データをエクスポートしました:\n{file_path}")
+    
+    def on_export_failed(self, message: str):
+        self.close_export_progress()
+        self.add_log(f"❌ Excelエクスポートに失敗: {message}")
+        QMessageBox.critical(self, "エラー", f"エクスポート中にエラーが発生しました:\n{message}")
+    
+    def on_export_cancelled(self):
+        self.close_export_progress()
+        self.add_log("📤 Excelエクスポートを中断しました")
+    
+    def on_export_finished(self):
+        self.export_thread.deleteLater()
+        self.export_thread = None
+    
+    def close_export_progress(self):
+        if self.export_progress:
+            self.export_progress.close()
+            self.export_progress.deleteLater()
+            self.export_progress = None
+    
+    def show_search(self):
+        dialog = VisitorSearchDialog(self.db_service, self)
+        dialog.visitor_selected.connect(self.on_visitor_selected)
         dialog.exec()
     
+    def on_visitor_selected(self, barcode: str, name: str):
+        # 検索で見つけた来場者を手動入力欄に入れる（チェックインはボタンで行う）
+        self.barcode_input.setText(barcode)
+        self.name_input.setText(name)
+        if self.current_mode == 'manual':
+            self.barcode_input.setFocus()
+    
     def add_log(self, message: str):
         from datetime import datetime
         timestamp = datetime.now().strftime('%H:%M:%S')
-        self.log_text.append(f"[{timestamp}] {message}")
-        scrollbar = self.log_text.verticalScrollBar()
-        scrollbar.setValue(scrollbar.maximum())
+        # 末尾を表示しているときは appendPlainText が自動でスクロールする
+        self.log_text.appendPlainText(f"[{timestamp}] {message}")
+        self.event_log.write(message)
     
     def closeEvent(self, event):
         if self.scanner_active:
             self.stop_scanner()
+        self.keyboard_wedge.uninstall()
+        self.scanner_manager.watcher.stop()
+        if self.statistics_window is not None:
+            self.statistics_window.done(0)
+        # 終了するときだけは実行中のエクスポートを中断する（書きかけのファイルは残らない）
+        if self.export_thread is not None:
+            self.export_thread.cancel()
+            self.export_thread.wait()
+        # 未書き込みのチェックインをすべてコミットしてから接続を閉じる
+        self.db_service.close()
+        self.db.close()
+        self.event_log.close()
         event.accept()
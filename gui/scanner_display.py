@@ -0,0 +1,161 @@
+from PySide6.QtWidgets import QGroupBox, QVBoxLayout, QLabel, QStackedWidget
+from PySide6.QtCore import Qt, QTimer
+
+class ScannerDisplay(QGroupBox):
+    """
+    スキャナーモードの大画面表示（バーコード・氏名・ステータス）
+    
+    表示は idle / scanned / new_visitor / first_visit / returning / error のいずれかの状態をとる。
+    ラベルの見た目の種類ごとに動的プロパティ state を設定したラベルをあらかじめ作って
+    QStackedWidget に並べ、STYLE_SHEET は最初に1回だけ適用する。状態の切り替えは表示する
+    ラベルを選んで文字を入れるだけで、スキャンごとに CSS の解析やスタイルの当て直しは行わない。
+    結果の表示は状態ごとの秒数が経つと idle に戻る（次のスキャンでタイマーは掛け直す）。
+    """
+    STATES = ('idle', 'scanned', 'new_visitor', 'first_visit', 'returning', 'error')
+    
+    # 状態ごとに各ラベルが使う見た目（STYLE_SHEET の state の値）
+    PART_STYLES = {
+        'barcode': {
+            'idle': 'idle', 'scanned': 'active', 'new_visitor': 'active',
+            'first_visit': 'active', 'returning': 'active', 'error': 'active',
+        },
+        'name': {
+            'idle': 'normal', 'scanned': 'normal', 'new_visitor': 'new_visitor',
+            'first_visit': 'result', 'returning': 'result', 'error': 'normal',
+        },
+        'status': {
+            'idle': 'normal', 'scanned': 'normal', 'new_visitor': 'new_visitor',
+            'first_visit': 'first_visit', 'returning': 'returning', 'error': 'error',
+        },
+    }
+    
+    # idle に戻るまでのミリ秒（0 は戻さない）
+    RESET_DELAYS_MS = {
+        'idle': 0,
+        'scanned': 0,
+        'new_visitor': 3000,
+        'first_visit': 5000,
+        'returning': 5000,
+        'error': 3000,
+    }
+    
+    IDLE_TEXT = "バーコードをスキャンしてください"
+    BUSY_TEXT = "⏳ 処理中..."
+    
+    STYLE_SHEET = """
+        QLabel#scannedBarcode {
+            background-color: #f5f5f5;
+            border: 3px solid #2196F3;
+            border-radius: 10px;
+            padding: 25px;
+            font-size: 48px;
+            font-weight: bold;
+            color: #2196F3;
+            min-height: 100px;
+            max-height: 120px;
+        }
+        QLabel#scannedBarcode[state="active"] { background-color: #E3F2FD; color: #1976D2; }
+        
+        QLabel#scannedName {
+            font-size: 64px;
+            font-weight: bold;
+            color: #333;
+            padding: 15px;
+            min-height: 90px;
+            max-height: 110px;
+        }
+        QLabel#scannedName[state="new_visitor"] { color: #FF9800; }
+        QLabel#scannedName[state="result"] { font-size: 72px; }
+        
+        QLabel#scannedStatus {
+            font-size: 36px;
+            font-weight: bold;
+            padding: 12px;
+            border-radius: 8px;
+            min-height: 60px;
+            max-height: 80px;
+        }
+        QLabel#scannedStatus[state="new_visitor"] { background-color: #FFF3E0; color: #F57C00; }
+        QLabel#scannedStatus[state="first_visit"] { background-color: #C8E6C9; color: #2E7D32; font-size: 42px; }
+        QLabel#scannedStatus[state="returning"] { background-color: #BBDEFB; color: #1565C0; font-size: 42px; }
+        QLabel#scannedStatus[state="error"] { background-color: #FFCDD2; color: #C62828; }
+    """
+    
+    def __init__(self, title: str = "読み取り表示", parent=None):
+        super().__init__(title, parent)
+        self.state = None
+        
+        layout = QVBoxLayout(self)
+        layout.setSpacing(8)
+        
+        # 上から バーコード / 氏名 / ステータス
+        self._parts = {}
+        for part, object_name in (('barcode', 'scannedBarcode'),
+                                  ('name', 'scannedName'),
+                                  ('status', 'scannedStatus')):
+            stack = QStackedWidget()
+            labels = {}
+            for style in dict.fromkeys(self.PART_STYLES[part].values()):
+                label = QLabel()
+                label.setObjectName(object_name)
+                label.setProperty("state", style)
+                label.setAlignment(Qt.AlignCenter)
+                stack.addWidget(label)
+                labels[style] = label
+            layout.addWidget(stack)
+            self._parts[part] = (stack, labels)
+        self.setStyleSheet(self.STYLE_SHEET)
+        
+        self._reset_timer = QTimer(self)
+        self._reset_timer.setSingleShot(True)
+        self._reset_timer.timeout.connect(self.reset)
+        self.reset()
+    
+    def reset(self):
+        """待機中の表示に戻す"""
+        self._set_state('idle', self.IDLE_TEXT, "", "")
+    
+    def show_scanned(self, barcode: str):
+        self._set_state('scanned', f"ID: {barcode}", "", "")
+    
+    def show_new_visitor(self, barcode: str):
+        self._set_state('new_visitor', f"ID: {barcode}", "新規来場者", "⚠️ スタッフに氏名を伝えてください")
+    
+    def show_check_in(self, barcode: str, name: str, is_first_visit: bool, visit_count: int):
+        if is_first_visit:
+            self._set_state('first_visit', f"ID: {barcode}", name, "🎉 初回来場 - ようこそ！")
+        else:
+            self._set_state('returning', f"ID: {barcode}", name, f"🔄 {visit_count}回目の来場 - お帰りなさい！")
+    
+    def show_error(self, message: str):
+        self._set_state('error', self.text('barcode'), "エラー", f"❌ {message}")
+    
+    def set_busy(self, busy: bool):
+        """処理待ちの表示（ステータスが空いているときだけ）"""
+        status = self._current_label('status')
+        if busy and not status.text():
+            status.setText(self.BUSY_TEXT)
+        elif not busy and status.text() == self.BUSY_TEXT:
+            status.setText("")
+    
+    def text(self, part: str) -> str:
+        """表示中の文字（part は 'barcode' / 'name' / 'status'）"""
+        return self._current_label(part).text()
+    
+    def _current_label(self, part: str) -> QLabel:
+        return self._parts[part][0].currentWidget()
+    
+    def _set_state(self, state: str, barcode_text: str, name_text: str, status_text: str):
+        self.state = state
+        for part, text in (('barcode', barcode_text), ('name', name_text), ('status', status_text)):
+            stack, labels = self._parts[part]
+            label = labels[self.PART_STYLES[part][state]]
+            label.setText(text)
+            if stack.currentWidget() is not label:
+                stack.setCurrentWidget(label)
+        
+        delay = self.RESET_DELAYS_MS[state]
+        if delay:
+            self._reset_timer.start(delay)
+        else:
+            self._reset_timer.stop()
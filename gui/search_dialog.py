@@ -0,0 +1,131 @@
+from PySide6.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QLabel, QLineEdit,
+                                QPushButton, QTableWidget, QTableWidgetItem, QHeaderView,
+                                QAbstractItemView)
+from PySide6.QtCore import QTimer, Signal
+
+from core.database import VisitorDatabase
+from core.db_service import DatabaseService
+
+class VisitorSearchDialog(QDialog):
+    """
+    来場者検索ダイアログ（氏名の一部・バーコードの先頭で検索）
+    
+    入力が DEBOUNCE_MS 止まってから DatabaseService に検索を要求する。応答待ちの間に入力が
+    変わった場合は、DatabaseService が応答の後に最新の入力で1回だけ検索し直す。
+    """
+    # 選択した来場者（手動入力欄に設定する）
+    visitor_selected = Signal(str, str)  # barcode, name
+    
+    DEBOUNCE_MS = 150
+    COLUMNS = ('バーコード', '氏名', '来場回数', '最終来場')
+    
+    def __init__(self, service: DatabaseService, parent=None):
+        super().__init__(parent)
+        self.service = service
+        self.service.search_results_ready.connect(self.on_search_results)
+        self.service.request_failed.connect(self.on_request_failed)
+        self.visitors = []
+        self.setWindowTitle("来場者検索")
+        self.setMinimumSize(640, 480)
+        
+        self._debounce_timer = QTimer(self)
+        self._debounce_timer.setSingleShot(True)
+        self._debounce_timer.setInterval(self.DEBOUNCE_MS)
+        self._debounce_timer.timeout.connect(self.search)
+        
+        self.init_ui()
+    
+    def init_ui(self):
+        layout = QVBoxLayout(self)
+        
+        self.search_input = QLineEdit()
+        self.search_input.setPlaceholderText("氏名の一部、またはバーコードの先頭を入力")
+        self.search_input.setClearButtonEnabled(True)
+        self.search_input.setStyleSheet("QLineEdit { font-size: 16px; padding: 8px; }")
+        self.search_input.textChanged.connect(self._debounce_timer.start)
+        # Enter は待たずにすぐ検索する
+        self.search_input.returnPressed.connect(self.search)
+        layout.addWidget(self.search_input)
+        
+        self.lbl_status = QLabel("")
+        self.lbl_status.setStyleSheet("QLabel { color: #757575; font-size: 11px; }")
+        layout.addWidget(self.lbl_status)
+        
+        self.results_table = QTableWidget(0, len(self.COLUMNS))
+        self.results_table.setHorizontalHeaderLabels(self.COLUMNS)
+        self.results_table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.results_table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.results_table.setSelectionMode(QAbstractItemView.SingleSelection)
+        self.results_table.verticalHeader().setVisible(False)
+        self.results_table.horizontalHeader().setSectionResizeMode(1, QHeaderView.Stretch)
+        self.results_table.doubleClicked.connect(self.select_current)
+        layout.addWidget(self.results_table)
+        
+        button_layout = QHBoxLayout()
+        button_layout.addStretch()
+        
+        self.btn_select = QPushButton("手動入力欄に設定")
+        self.btn_select.setAutoDefault(False)
+        self.btn_select.setEnabled(False)
+        self.btn_select.clicked.connect(self.select_current)
+        button_layout.addWidget(self.btn_select)
+        
+        btn_close = QPushButton("閉じる")
+        btn_close.setAutoDefault(False)
+        btn_close.clicked.connect(self.reject)
+        button_layout.addWidget(btn_close)
+        
+        layout.addLayout(button_layout)
+        self.results_table.itemSelectionChanged.connect(
+            lambda: self.btn_select.setEnabled(bool(self.results_table.selectedItems()))
+        )
+    
+    def search(self):
+        """入力中の語で検索を要求"""
+        self._debounce_timer.stop()
+        query = self.search_input.text().strip()
+        if not query:
+            # 応答待ちの検索があっても、その結果は表示しない
+            self.service.cancel_pending('search')
+            self.show_results([])
+            self.lbl_status.setText("")
+            return
+        self.service.search_visitors(query)
+    
+    def on_search_results(self, query: str, visitors: list):
+        self.show_results(visitors)
+        if not visitors:
+            self.lbl_status.setText("該当する来場者はいません")
+        elif len(visitors) >= VisitorDatabase.SEARCH_LIMIT:
+            self.lbl_status.setText(f"上位 {len(visitors)}件を表示しています（語を増やすと絞り込めます）")
+        else:
+            self.lbl_status.setText(f"{len(visitors)}件")
+    
+    def on_request_failed(self, operation: str, message: str):
+        if operation == 'search':
+            self.lbl_status.setText(f"❌ 検索に失敗しました: {message}")
+    
+    def show_results(self, visitors: list):
+        self.visitors = visitors
+        self.results_table.setRowCount(len(visitors))
+        for row, visitor in enumerate(visitors):
+            last_visit = visitor.last_visit_date if visitor.visit_count > 0 else "未来場"
+            for column, value in enumerate((visitor.barcode, visitor.name,
+                                            str(visitor.visit_count), last_visit)):
+                self.results_table.setItem(row, column, QTableWidgetItem(value))
+        if visitors:
+            self.results_table.selectRow(0)
+    
+    def select_current(self):
+        row = self.results_table.currentRow()
+        if 0 <= row < len(self.visitors):
+            visitor = self.visitors[row]
+            self.visitor_selected.emit(visitor.barcode, visitor.name)
+            self.accept()
+    
+    def done(self, result: int):
+        self._debounce_timer.stop()
+        self.service.cancel_pending('search')
+        self.service.search_results_ready.disconnect(self.on_search_results)
+        self.service.request_failed.disconnect(self.on_request_failed)
+        super().done(result)
@@ -1,18 +1,192 @@
+from datetime import datetime, timedelta
+
 from PySide6.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QLabel, 
-                                QGroupBox, QTableWidget, QTableWidgetItem,
-                                QPushButton, QFileDialog, QMessageBox)
-from PySide6.QtCore import Qt
-from PySide6.QtGui import QFont
-from core.database import VisitorDatabase
+                                QGroupBox, QTableView, QWidget, QDateEdit, QComboBox,
+                                QPushButton, QFileDialog, QMessageBox, QProgressDialog,
+                                QHeaderView)
+from PySide6.QtCore import Qt, QThread, Signal, QDate, QPointF, QRectF
+from PySide6.QtGui import QFont, QPainter, QColor
+from core.database import VisitorDatabase, ExportCancelled
+from core.db_service import DatabaseService
+from gui.visits_model import TodayVisitsModel
+
+class ExportThread(QThread):
+    """Excelエクスポートをバックグラウンドで実行するスレッド"""
+    progress = Signal(int, int)
+    succeeded = Signal(str)
+    failed = Signal(str)
+    cancelled = Signal()
+    
+    def __init__(self, db: VisitorDatabase, file_path: str, parent=None):
+        super().__init__(parent)
+        self.db = db
+        self.file_path = file_path
+    
+    def run(self):
+        try:
+            self.db.export_to_excel(
+                self.file_path,
+                progress_callback=self.progress.emit,
+                is_cancelled=self.isInterruptionRequested
+            )
+            self.succeeded.emit(self.file_path)
+        except ExportCancelled:
+            self.cancelled.emit()
+        except Exception as e:
+            self.failed.emit(str(e))
+        finally:
+            self.db.release_connection()
+    
+    def cancel(self):
+        """エクスポートを中断（書きかけのファイルは残らない）"""
+        self.requestInterruption()
+
+class RegistrationImportThread(QThread):
+    """事前登録者名簿のインポートをバックグラウンドで実行するスレッド"""
+    progress = Signal(int, int)
+    succeeded = Signal(dict)
+    failed = Signal(str)
+    
+    def __init__(self, db: VisitorDatabase, file_path: str, parent=None):
+        super().__init__(parent)
+        self.db = db
+        self.file_path = file_path
+    
+    def run(self):
+        try:
+            result = self.db.import_registrations(self.file_path, progress_callback=self.progress.emit)
+            self.succeeded.emit(result)
+        except Exception as e:
+            self.failed.emit(str(e))
+        finally:
+            self.db.release_connection()
+
+class ArrivalChart(QWidget):
+    """
+    時間帯別の来場数の積み上げ棒グラフ（下が初回来場、上が再来場）
+    
+    set_data() で受け取った区間ごとの集計をそのまま描くだけなので、描画の手間は区間の数で決まり、
+    来場件数には左右されない。
+    """
+    FIRST_COLOR = QColor('#66BB6A')
+    RETURNING_COLOR = QColor('#42A5F5')
+    AXIS_COLOR = QColor('#9E9E9E')
+    MARGIN_LEFT = 40
+    MARGIN_RIGHT = 10
+    MARGIN_TOP = 22
+    MARGIN_BOTTOM = 22
+    # 目盛りの間隔（時間）の候補。ラベルが詰まりすぎない最小のものを使う
+    LABEL_STEP_HOURS = (1, 2, 3, 6, 12, 24, 48, 168, 720, 2160, 8760)
+    MIN_LABEL_SPACING = 48
+    
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.buckets = []
+        self.bucket_minutes = 15
+        self.setMinimumHeight(180)
+    
+    def set_data(self, buckets: list, bucket_minutes: int):
+        self.buckets = buckets
+        self.bucket_minutes = bucket_minutes
+        self.update()
+    
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.fillRect(self.rect(), Qt.white)
+        if not self.buckets:
+            return
+        peak = max(bucket.total_visits for bucket in self.buckets)
+        if peak == 0:
+            painter.setPen(self.AXIS_COLOR)
+            painter.drawText(self.rect(), Qt.AlignCenter, "この期間の来場はありません")
+            return
+        
+        # 区切りが長いと件数の桁が増えるため、縦軸の目盛りの幅に合わせて左の余白を広げる
+        margin_left = max(self.MARGIN_LEFT, painter.fontMetrics().horizontalAdvance(str(peak)) + 8)
+        plot = self.rect().adjusted(margin_left, self.MARGIN_TOP,
+                                    -self.MARGIN_RIGHT, -self.MARGIN_BOTTOM)
+        if plot.width() <= 0 or plot.height() <= 0:
+            return
+        
+        # 凡例
+        painter.setPen(Qt.black)
+        legend_x = plot.left()
+        for color, text in ((self.FIRST_COLOR, "初回来場"), (self.RETURNING_COLOR, "再来場")):
+            painter.fillRect(legend_x, 6, 10, 10, color)
+            painter.drawText(legend_x + 14, 16, text)
+            legend_x += 14 + painter.fontMetrics().horizontalAdvance(text) + 16
+        
+        # 棒（区間が画面の幅より多い場合は1ピクセルに複数の区間が重なる）
+        scale = plot.height() / peak
+        width = plot.width() / len(self.buckets)
+        bar_width = max(1.0, width - 1) if width >= 3 else max(1.0, width)
+        for i, bucket in enumerate(self.buckets):
+            if bucket.total_visits == 0:
+                continue
+            x = plot.left() + i * width
+            first_height = bucket.first_visits * scale
+            returning_height = bucket.returning_visits * scale
+            painter.fillRect(QRectF(x, plot.bottom() - first_height, bar_width, first_height),
+                             self.FIRST_COLOR)
+            painter.fillRect(QRectF(x, plot.bottom() - first_height - returning_height,
+                                    bar_width, returning_height), self.RETURNING_COLOR)
+        
+        # 軸と目盛り
+        painter.setPen(self.AXIS_COLOR)
+        painter.drawLine(plot.bottomLeft(), plot.bottomRight())
+        painter.drawLine(plot.bottomLeft(), plot.topLeft())
+        painter.setPen(Qt.black)
+        painter.drawText(QRectF(0, plot.top() - 6, margin_left - 4, 12),
+                         Qt.AlignRight | Qt.AlignVCenter, str(peak))
+        painter.drawText(QRectF(0, plot.bottom() - 6, margin_left - 4, 12),
+                         Qt.AlignRight | Qt.AlignVCenter, "0")
+        
+        buckets_per_hour = 60 / self.bucket_minutes
+        pixels_per_hour = width * buckets_per_hour
+        step_hours = next((step for step in self.LABEL_STEP_HOURS
+                           if step * pixels_per_hour >= self.MIN_LABEL_SPACING),
+                          self.LABEL_STEP_HOURS[-1])
+        first_start = self.buckets[0].start
+        span_hours = len(self.buckets) / buckets_per_hour
+        if span_hours <= 24:
+            label_format = '%H:%M'
+        elif step_hours < 24:
+            label_format = '%m/%d %H時'
+        else:
+            label_format = '%Y/%m/%d'
+        hour = 0
+        while hour <= span_hours:
+            x = plot.left() + hour * pixels_per_hour
+            label = datetime.fromtimestamp(first_start + hour * 3600).strftime(label_format)
+            painter.drawLine(QPointF(x, plot.bottom()), QPointF(x, plot.bottom() + 3))
+            painter.drawText(QRectF(x - 40, plot.bottom() + 4, 80, 16), Qt.AlignHCenter, label)
+            hour += step_hours
 
 class StatisticsWindow(QDialog):
-    """統計情報表示ウィンドウ"""
+    """
+    統計情報表示ウィンドウ
+    
+    Excelエクスポートは export_requested で出力先を通知し、実行はメインウィンドウが受け持つ
+    （ウィンドウを閉じてもエクスポートは続き、その間もチェックインできる）。
+    """
+    export_requested = Signal(str)  # file_path
+    # 時間帯別の来場数の期間として選べる最も古い日付
+    MIN_DATE = QDate(2000, 1, 1)
     
-    def __init__(self, db: VisitorDatabase, parent=None):
+    def __init__(self, db: VisitorDatabase, service: DatabaseService, parent=None):
         super().__init__(parent)
         self.db = db
+        self.service = service
+        self.service.stats_ready.connect(self.on_stats_ready)
+        self.service.stats_changed.connect(self.on_stats_ready)
+        self.service.stats_changed.connect(self.on_visits_changed)
+        self.service.arrivals_ready.connect(self.on_arrivals_ready)
+        # 本日の来場者はスクロールに合わせて少しずつ読み込み、新しいチェックインは先頭に追加する
+        self.visits_model = TodayVisitsModel(service, self)
+        self.import_thread = None
+        self.import_progress = None
         self.setWindowTitle("来場統計")
-        self.setMinimumSize(800, 600)
+        self.setMinimumSize(800, 800)
         
         self.init_ui()
         self.load_data()
@@ -50,14 +224,59 @@ class StatisticsWindow(QDialog):
         stats_group.setLayout(stats_layout)
         layout.addWidget(stats_group)
         
+        # 時間帯別の来場数（チェックインのたびに加算している分別集計から描く）
+        arrivals_group = QGroupBox("時間帯別の来場数")
+        arrivals_layout = QVBoxLayout()
+        
+        range_row = QHBoxLayout()
+        range_row.addWidget(QLabel("期間:"))
+        self.date_from = QDateEdit(QDate.currentDate())
+        self.date_from.setMinimumDate(self.MIN_DATE)
+        self.date_from.setCalendarPopup(True)
+        self.date_from.setDisplayFormat("yyyy-MM-dd")
+        range_row.addWidget(self.date_from)
+        range_row.addWidget(QLabel("〜"))
+        self.date_to = QDateEdit(QDate.currentDate())
+        self.date_to.setMinimumDate(self.MIN_DATE)
+        self.date_to.setCalendarPopup(True)
+        self.date_to.setDisplayFormat("yyyy-MM-dd")
+        range_row.addWidget(self.date_to)
+        range_row.addWidget(QLabel("区切り:"))
+        self.combo_bucket = QComboBox()
+        for minutes in (5, 15, 60):
+            self.combo_bucket.addItem(f"{minutes}分", minutes)
+        self.combo_bucket.setCurrentIndex(1)
+        range_row.addWidget(self.combo_bucket)
+        # 期間が長く、選んだ区切りでは区間が多すぎる場合に使った区切りを表示
+        self.lbl_bucket_note = QLabel("")
+        self.lbl_bucket_note.setStyleSheet("QLabel { color: #757575; font-size: 11px; }")
+        range_row.addWidget(self.lbl_bucket_note)
+        range_row.addStretch()
+        self.lbl_peak = QLabel("ピーク: -")
+        self.lbl_peak.setStyleSheet("QLabel { font-weight: bold; }")
+        range_row.addWidget(self.lbl_peak)
+        arrivals_layout.addLayout(range_row)
+        
+        self.arrival_chart = ArrivalChart()
+        arrivals_layout.addWidget(self.arrival_chart)
+        
+        self.date_from.dateChanged.connect(self.load_arrivals)
+        self.date_to.dateChanged.connect(self.load_arrivals)
+        self.combo_bucket.currentIndexChanged.connect(self.load_arrivals)
+        
+        arrivals_group.setLayout(arrivals_layout)
+        layout.addWidget(arrivals_group)
+        
         # 本日の来場者リスト
         list_group = QGroupBox("本日の来場者")
         list_layout = QVBoxLayout()
         
-        self.visitors_table = QTableWidget()
-        self.visitors_table.setColumnCount(4)
-        self.visitors_table.setHorizontalHeaderLabels(['時刻', 'バーコード', '氏名', '状態'])
+        self.visitors_table = QTableView()
+        self.visitors_table.setModel(self.visits_model)
         self.visitors_table.horizontalHeader().setStretchLastSection(True)
+        # 行の高さを1行ずつ計算しない（件数が多くても表示の手間が変わらないように）
+        self.visitors_table.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        self.visitors_table.verticalHeader().setDefaultSectionSize(24)
         list_layout.addWidget(self.visitors_table)
         
         list_group.setLayout(list_layout)
@@ -66,9 +285,14 @@ class StatisticsWindow(QDialog):
         # ボタン
         button_layout = QHBoxLayout()
         
-        btn_export = QPushButton("Excelエクスポート")
-        btn_export.clicked.connect(self.export_data)
-        button_layout.addWidget(btn_export)
+        self.btn_export = QPushButton("Excelエクスポート")
+        self.btn_export.clicked.connect(self.export_data)
+        button_layout.addWidget(self.btn_export)
+        
+        self.btn_import = QPushButton("名簿インポート")
+        self.btn_import.setToolTip("事前登録者名簿（見出し: バーコード, 氏名）を取り込みます")
+        self.btn_import.clicked.connect(self.import_registrations)
+        button_layout.addWidget(self.btn_import)
         
         btn_refresh = QPushButton("更新")
         btn_refresh.clicked.connect(self.load_data)
@@ -81,37 +305,146 @@ class StatisticsWindow(QDialog):
         layout.addLayout(button_layout)
     
     def load_data(self):
-        """データを読み込んで表示"""
-        # 統計情報を更新
-        stats = self.db.get_statistics()
+        """データの読み込みを要求（結果はシグナルで受け取って表示）"""
+        self.service.refresh_stats()
+        self.visits_model.reload()
+        self.load_arrivals()
+    
+    def on_stats_ready(self, stats: dict):
         for key, value in stats.items():
             if key in self.stats_labels:
                 self.stats_labels[key].setText(str(value))
+    
+    def on_visits_changed(self, stats: dict):
+        # チェックインのコミットや他の端末からの書き込みがあったときだけ差分を読む
+        self.visits_model.refresh_new()
+        start, end = self.arrivals_range()
+        if start <= datetime.now() < end:
+            self.load_arrivals()
+    
+    def arrivals_range(self):
+        """時間帯別の来場数の期間（開始日の0時 〜 終了日の翌日0時）"""
+        date_from = self.date_from.date().toPython()
+        date_to = max(self.date_to.date().toPython(), date_from)
+        start = datetime.combine(date_from, datetime.min.time())
+        end = datetime.combine(date_to + timedelta(days=1), datetime.min.time())
+        return start, end
+    
+    def load_arrivals(self, *args):
+        """時間帯別の来場数を要求（応答待ちの間の要求は DatabaseService が最新の期間で1回にまとめる）"""
+        start, end = self.arrivals_range()
+        # 区間の数は MAX_ARRIVAL_BUCKETS までに抑え、期間がどれだけ長くても描画の手間は変わらない
+        selected = self.combo_bucket.currentData()
+        bucket_minutes = VisitorDatabase.arrival_bucket_minutes(start, end, selected)
+        if bucket_minutes == selected:
+            self.lbl_bucket_note.setText("")
+        else:
+            self.lbl_bucket_note.setText(f"（期間が長いため {self.format_minutes(bucket_minutes)}ごと）")
+        self.service.load_arrivals(start, end, bucket_minutes)
+    
+    @staticmethod
+    def format_minutes(minutes: int) -> str:
+        if minutes % 1440 == 0:
+            return f"{minutes // 1440}日"
+        if minutes % 60 == 0:
+            return f"{minutes // 60}時間"
+        return f"{minutes}分"
+    
+    def on_arrivals_ready(self, result: dict):
+        self.arrival_chart.set_data(result['buckets'], result['bucket_minutes'])
         
-        # 本日の来場者リストを更新
-        visitors = self.db.get_today_visitors()
-        self.visitors_table.setRowCount(len(visitors))
-        
-        for i, visitor in enumerate(visitors):
-            self.visitors_table.setItem(i, 0, QTableWidgetItem(visitor['visit_time']))
-            self.visitors_table.setItem(i, 1, QTableWidgetItem(visitor['barcode']))
-            self.visitors_table.setItem(i, 2, QTableWidgetItem(visitor['name']))
-            
-            status = '初回来場' if visitor['is_first_visit'] else '再来場'
-            status_item = QTableWidgetItem(status)
-            if visitor['is_first_visit']:
-                status_item.setBackground(Qt.green)
-            self.visitors_table.setItem(i, 3, status_item)
+        peak = result['peak']
+        if peak is None:
+            self.lbl_peak.setText("ピーク: -")
+        else:
+            at = datetime.fromtimestamp(peak.start)
+            self.lbl_peak.setText(
+                f"ピーク: {at.strftime('%m/%d %H:%M')} に {peak.total_visits}人/分"
+                f"（初回 {peak.first_visits}・再来場 {peak.returning_visits}）"
+            )
     
     def export_data(self):
-        """データをExcelにエクスポート"""
+        """エクスポート先を選んでメインウィンドウにエクスポートを依頼（このウィンドウを閉じても続く）"""
         file_path, _ = QFileDialog.getSaveFileName(
             self, "エクスポート先を選択", "", "Excel Files (*.xlsx)"
         )
         
-        if file_path:
-            try:
-                self.db.export_to_excel(file_path)
-                QMessageBox.information(self, "成功", f"データをエクスポートしました:\n{file_path}")
-            except Exception as e:
-                QMessageBox.critical(self, "エラー", f"エクスポート中にエラーが発生しました:\n{str(e)}")
+        if not file_path:
+            return
+        
+        self.export_requested.emit(file_path)
+    
+    def import_registrations(self):
+        """事前登録者名簿を取り込む（バックグラウンドで実行）"""
+        if self.import_thread is not None:
+            return
+        
+        file_path, _ = QFileDialog.getOpenFileName(
+            self, "名簿ファイルを選択", "", "名簿ファイル (*.xlsx *.csv)"
+        )
+        
+        if not file_path:
+            return
+        
+        # 取り込みは1つのトランザクションで行うため中断はできない
+        self.import_progress = QProgressDialog("名簿を取り込み中...", None, 0, 0, self)
+        self.import_progress.setWindowTitle("名簿インポート")
+        self.import_progress.setWindowModality(Qt.WindowModal)
+        self.import_progress.setMinimumDuration(0)
+        self.import_progress.setAutoClose(False)
+        self.import_progress.setAutoReset(False)
+        
+        self.import_thread = RegistrationImportThread(self.db, file_path, self)
+        self.import_thread.progress.connect(self.on_import_progress)
+        self.import_thread.succeeded.connect(self.on_import_succeeded)
+        self.import_thread.failed.connect(self.on_import_failed)
+        self.import_thread.finished.connect(self.on_import_finished)
+        
+        self.btn_import.setEnabled(False)
+        self.import_thread.start()
+    
+    def on_import_progress(self, done: int, total: int):
+        if not self.import_progress:
+            return
+        if total > 0:
+            self.import_progress.setMaximum(100)
+            self.import_progress.setValue(min(int(done * 100 / total), 100))
+            self.import_progress.setLabelText(f"名簿を取り込み中... {done:,} / {total:,} 行")
+        else:
+            self.import_progress.setLabelText(f"名簿を取り込み中... {done:,} 行")
+    
+    def on_import_succeeded(self, result: dict):
+        self.close_import_progress()
+        QMessageBox.information(
+            self, "成功",
+            f"{result['imported']:,}件を登録しました（読み飛ばし: {result['skipped']:,}行）"
+        )
+        self.load_data()
+    
+    def on_import_failed(self, message: str):
+        self.close_import_progress()
+        QMessageBox.critical(self, "エラー", f"名簿の取り込み中にエラーが発生しました:\n{message}")
+    
+    def on_import_finished(self):
+        self.import_thread.deleteLater()
+        self.import_thread = None
+        self.btn_import.setEnabled(True)
+    
+    def close_import_progress(self):
+        if self.import_progress:
+            self.import_progress.close()
+            self.import_progress.deleteLater()
+            self.import_progress = None
+    
+    def done(self, result: int):
+        # 名簿の取り込みは完了を待ってから閉じる（エクスポートはメインウィンドウで続く）
+        if self.import_thread is not None:
+            self.import_thread.wait()
+        self.service.stats_ready.disconnect(self.on_stats_ready)
+        self.service.stats_changed.disconnect(self.on_stats_ready)
+        self.service.stats_changed.disconnect(self.on_visits_changed)
+        self.service.arrivals_ready.disconnect(self.on_arrivals_ready)
+        # 次に開いたウィンドウに、このウィンドウが要求した結果が届かないようにする
+        self.service.cancel_pending('arrivals')
+        self.visits_model.detach()
+        super().done(result)
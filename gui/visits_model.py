@@ -0,0 +1,147 @@
+from datetime import datetime
+
+from PySide6.QtCore import QAbstractTableModel, QModelIndex, Qt
+from PySide6.QtGui import QColor
+
+from core.database import Visit
+from core.db_service import DatabaseService
+
+class TodayVisitsModel(QAbstractTableModel):
+    """
+    本日の来場履歴を新しい順に表示するモデル
+    
+    行はビューがスクロールして必要になった分だけ DatabaseService から1ページずつ読み込む
+    （canFetchMore / fetchMore）。ページの境目は最後の行の (visit_time, id) で指定するため、
+    何ページ目でも取得にかかる時間は変わらない。新しいチェックインは refresh_new() で
+    最大の id より後の行だけを読み、先頭に追加する。
+    
+    行は、ページで読んだ分（古い方へ伸びる）と後から追加された分（新しい方へ伸びる）の
+    2つのリストに分けて持ち、どちらもリストの末尾に追加するだけで済むようにしている。
+    """
+    COLUMNS = ('時刻', 'バーコード', '氏名', '状態')
+    FIRST_VISIT_COLOR = QColor(Qt.green)
+    
+    def __init__(self, service: DatabaseService, parent=None):
+        super().__init__(parent)
+        self.service = service
+        self.service.visits_page_ready.connect(self._on_page_ready)
+        self.service.new_visits_ready.connect(self._on_new_visits_ready)
+        self.service.request_failed.connect(self._on_request_failed)
+        self.visit_date = datetime.now().strftime('%Y-%m-%d')
+        self._paged = []                # 読み込んだページの行（新しい順）
+        self._added = []                # 後から追加された行（古い順）
+        self._max_id = 0
+        self._at_end = False
+        self._page_request = None       # 応答待ちのページ (visit_date, after)
+    
+    def reload(self):
+        """表示中の行を捨てて先頭ページから読み直す（日付も今日に合わせる）"""
+        self.beginResetModel()
+        self.visit_date = datetime.now().strftime('%Y-%m-%d')
+        self._paged = []
+        self._added = []
+        self._max_id = 0
+        self._at_end = False
+        self._page_request = None
+        # 読み直す前の追加分の応答は受け取らない
+        self.service.cancel_pending('new_visits')
+        self.endResetModel()
+        self.fetchMore(QModelIndex())
+    
+    def refresh_new(self):
+        """前回読み込んだ後に追加された来場履歴を先頭に追加（要求が重なった分は DatabaseService がまとめる）"""
+        if self._page_request is not None and not self._paged:
+            # 先頭ページが届くまでは最大の id が分からない（届いた後に読み直す）
+            return
+        self.service.load_new_visits(self.visit_date, self._max_id)
+    
+    def detach(self):
+        """サービスのシグナルとの接続を解除（ウィンドウを閉じるとき）"""
+        self.service.cancel_pending('new_visits')
+        self.service.visits_page_ready.disconnect(self._on_page_ready)
+        self.service.new_visits_ready.disconnect(self._on_new_visits_ready)
+        self.service.request_failed.disconnect(self._on_request_failed)
+    
+    def visit_at(self, row: int) -> Visit:
+        """row 行目の来場履歴（0 が最新）"""
+        added = len(self._added)
+        if row < added:
+            return self._added[added - 1 - row]
+        return self._paged[row - added]
+    
+    # ---- QAbstractTableModel ----
+    
+    def rowCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self._added) + len(self._paged)
+    
+    def columnCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.COLUMNS)
+    
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.COLUMNS[section]
+        return super().headerData(section, orientation, role)
+    
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        visit = self.visit_at(index.row())
+        column = index.column()
+        if role == Qt.DisplayRole:
+            if column == 0:
+                return visit.visit_time
+            if column == 1:
+                return visit.barcode
+            if column == 2:
+                return visit.name
+            return '初回来場' if visit.is_first_visit else '再来場'
+        if role == Qt.BackgroundRole and column == 3 and visit.is_first_visit:
+            return self.FIRST_VISIT_COLOR
+        return None
+    
+    def canFetchMore(self, parent=QModelIndex()) -> bool:
+        return not parent.isValid() and not self._at_end
+    
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid() or self._at_end or self._page_request is not None:
+            return
+        after = None
+        if self._paged:
+            last = self._paged[-1]
+            after = (last.visit_time, last.id)
+        self._page_request = (self.visit_date, after)
+        self.service.load_visits_page(self.visit_date, after)
+    
+    # ---- サービスからの応答 ----
+    
+    def _on_page_ready(self, visit_date: str, after, rows: list):
+        if self._page_request != (visit_date, after):
+            return
+        self._page_request = None
+        if len(rows) < self.service.db.VISITS_PAGE_SIZE:
+            self._at_end = True
+        if rows:
+            first = self.rowCount()
+            self.beginInsertRows(QModelIndex(), first, first + len(rows) - 1)
+            self._paged.extend(rows)
+            self.endInsertRows()
+            self._max_id = max(self._max_id, max(visit.id for visit in rows))
+        if after is None:
+            # 先頭ページの読み込み中に追加された分を取りこぼさないよう、すぐに差分を読む
+            self.refresh_new()
+    
+    def _on_new_visits_ready(self, visit_date: str, after_id: int, rows: list):
+        if visit_date != self.visit_date:
+            return
+        # 先頭ページや前回の追加分と重なった行は除く
+        rows = [visit for visit in rows if visit.id > self._max_id]
+        if rows:
+            self.beginInsertRows(QModelIndex(), 0, len(rows) - 1)
+            self._added.extend(reversed(rows))
+            self.endInsertRows()
+            self._max_id = max(visit.id for visit in rows)
+    
+    def _on_request_failed(self, operation: str, message: str):
+        # 失敗した要求は取り消し、次の操作で読み直せるようにする
+        if operation == 'visits_page':
+            self._page_request = None
@@ -0,0 +1,97 @@
+"""
+複数プロセスから同じ visitors.db に同時にチェックインしても来場回数が失われないことの確認
+
+    python test_concurrent_check_in.py [--processes 6] [--check-ins 300] [--barcodes 10]
+
+pytest からも test_concurrent_check_in() として実行できる。
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from core.database import VisitorDatabase
+
+def check_in_worker(db_path: str, worker: int, check_ins: int, barcodes: int):
+    # キャッシュは使わない（他のプロセスの書き込みを必ずデータベースから読む）
+    db = VisitorDatabase(db_path, visitor_cache_size=0)
+    try:
+        for i in range(check_ins):
+            db.check_in(f'B{(worker + i) % barcodes:04d}', f'来場者{(worker + i) % barcodes}')
+    finally:
+        db.close()
+
+def run(processes: int = 6, check_ins: int = 300, barcodes: int = 10) -> dict:
+    """processes 個のプロセスがそれぞれ check_ins 回チェックインし、集計が合っているか確認"""
+    with tempfile.TemporaryDirectory() as directory:
+        db_path = os.path.join(directory, 'visitors.db')
+        # スキーマの作成・マイグレーションは先に済ませておく
+        VisitorDatabase(db_path).close()
+        
+        workers = [multiprocessing.Process(target=check_in_worker,
+                                           args=(db_path, worker, check_ins, barcodes))
+                   for worker in range(processes)]
+        started = time.perf_counter()
+        for process in workers:
+            process.start()
+        for process in workers:
+            process.join()
+        elapsed = time.perf_counter() - started
+        assert all(process.exitcode == 0 for process in workers), \
+            [process.exitcode for process in workers]
+        
+        db = VisitorDatabase(db_path)
+        try:
+            conn = db.get_connection()
+            expected = processes * check_ins
+            total_count = conn.execute('SELECT SUM(visit_count) FROM visitors').fetchone()[0]
+            history = conn.execute('SELECT COUNT(*) FROM visit_history').fetchone()[0]
+            assert total_count == history == expected, (total_count, history, expected)
+            
+            # 初回来場はバーコードごとにちょうど1回
+            first_visits = dict(conn.execute('''
+                SELECT barcode, SUM(is_first_visit) FROM visit_history GROUP BY barcode
+            ''').fetchall())
+            assert len(first_visits) == min(barcodes, expected), first_visits
+            assert all(count == 1 for count in first_visits.values()), first_visits
+            
+            # 来場回数と来場履歴の件数はバーコードごとにも一致する
+            mismatched = conn.execute('''
+                SELECT v.barcode FROM visitors AS v
+                WHERE v.visit_count != (SELECT COUNT(*) FROM visit_history AS h
+                                        WHERE h.barcode = v.barcode)
+            ''').fetchall()
+            assert not mismatched, mismatched
+            
+            # 集計テーブルも来場履歴と一致する
+            stats = db.get_statistics()
+            assert stats['total_visits'] == expected, stats
+            assert stats['total_visitors'] == len(first_visits), stats
+            minute_total = conn.execute('SELECT SUM(total_visits) FROM minute_stats').fetchone()[0]
+            assert minute_total == expected, minute_total
+        finally:
+            db.close()
+    
+    return {'check_ins': expected, 'seconds': elapsed}
+
+def test_concurrent_check_in():
+    run(processes=4, check_ins=100, barcodes=10)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='複数プロセスからの同時チェックインの確認')
+    parser.add_argument('--processes', type=int, default=6)
+    parser.add_argument('--check-ins', type=int, default=300, help='1プロセスあたりのチェックイン回数')
+    parser.add_argument('--barcodes', type=int, default=10, help='使うバーコードの種類')
+    args = parser.parse_args()
+    
+    print("=" * 60)
+    print(f"同時チェックインの確認: {args.processes} プロセス x {args.check_ins} 回"
+          f"（バーコード {args.barcodes} 種類）")
+    print("=" * 60)
+    result = run(args.processes, args.check_ins, args.barcodes)
+    print(f"OK: {result['check_ins']} 件すべて記録されました"
+          f"（{result['seconds']:.2f} 秒, {result['check_ins'] / result['seconds']:.0f} 件/秒）")
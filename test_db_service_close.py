@@ -0,0 +1,44 @@
+"""
+DatabaseService を閉じる直前に受け付けたチェックインがすべて書き込まれることの確認
+    
+    python test_db_service_close.py [--scans 20]
+
+pytest からも test_close_flushes_queued_scans() として実行できる。
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from PySide6.QtCore import QCoreApplication
+
+from core.database import VisitorDatabase
+from core.db_service import DatabaseService
+
+def run(scans: int = 20) -> int:
+    """scans 件のスキャンを送った直後に close() し、書き込まれた来場履歴の件数を返す"""
+    app = QCoreApplication.instance() or QCoreApplication(sys.argv)  # noqa: F841（QThread に必要）
+    with tempfile.TemporaryDirectory() as directory:
+        db = VisitorDatabase(os.path.join(directory, 'visitors.db'))
+        try:
+            service = DatabaseService(db)
+            # 結果を待たずに閉じる（ワーカーのキューにスキャンが残った状態）
+            for i in range(scans):
+                service.submit_scan(f'B{i:04d}', 'manual', f'来場者{i}')
+            service.close()
+            return db.get_connection().execute('SELECT COUNT(*) FROM visit_history').fetchone()[0]
+        finally:
+            db.close()
+
+def test_close_flushes_queued_scans():
+    assert run(scans=20) == 20
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='終了直前のチェックインが失われないことの確認')
+    parser.add_argument('--scans', type=int, default=20)
+    args = parser.parse_args()
+    
+    written = run(args.scans)
+    print(f"{'OK' if written == args.scans else 'NG'}: {written} / {args.scans} 件書き込まれました")